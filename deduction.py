@@ -0,0 +1,141 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from hitman.hitman import HC
+from utils.GrilleConnaissance import GrilleConnaissance
+
+PERSONNES = (HC.GUARD_N.value, HC.GUARD_E.value, HC.GUARD_S.value, HC.GUARD_W.value,
+             HC.CIVIL_N.value, HC.CIVIL_E.value, HC.CIVIL_S.value, HC.CIVIL_W.value)
+OBJETS = (HC.TARGET.value, HC.SUIT.value, HC.PIANO_WIRE.value)
+# Hitman entend les gardes et civils du carré de 5x5 centré sur lui, le référé plafonne le compte à 5
+PORTEE_OUIE = 2
+OUIE_MAX = 5
+
+
+class Deduction:
+    """Propagation de contraintes sur les cases inconnues, sans solveur SAT.
+
+    Chaque écoute donne le nombre de personnes (gardes ou civils) autour d'une position et guard_count +
+    civil_count donne leur nombre sur toute la carte. Pour chaque contrainte « entre mini et maxi personnes
+    parmi ces cases », si les personnes déjà connues atteignent maxi les autres cases sont vides de
+    personnes, et si toutes les cases encore libres sont nécessaires pour atteindre mini elles en contiennent
+    une. Les déductions sont propagées jusqu'à ce que plus rien ne change.
+
+    La contrainte globale porte sur toute la carte : au lieu de la reparcourir à chaque case vue, on tient
+    à jour le nombre de personnes connues et de cases indécises, et elle n'est appliquée que quand l'un
+    des deux atteint sa borne.
+
+    Seules les cases réellement vues (voir) comptent comme connues : cases_connues contient aussi des gardes
+    supposés d'après les pénalités, qui fausseraient les comptes.
+    """
+
+    def __init__(self, grille: GrilleConnaissance, nb_gardes: int, nb_civils: int):
+        self.grille = grille
+        self.vues: Dict[Tuple[int, int], int] = {}
+        # True / False : case encore inconnue qui contient forcément / ne contient pas de personne
+        self.personnes: Dict[Tuple[int, int], bool] = {}
+        self.contraintes: List[Tuple[List[Tuple[int, int]], int, int]] = []
+        self.par_case: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.ecoutes: Set[Tuple[int, int]] = set()
+        self.a_verifier: Set[int] = set()
+        self.objets_vus: Set[int] = set()
+        # compteurs de la contrainte globale : personnes vues ou déduites, dont déduites sur des cases pas
+        # encore vues, et cases ni vues ni déduites
+        self.total_personnes = nb_gardes + nb_civils
+        self.nb_personnes = 0
+        self.nb_personnes_deduites = 0
+        self.nb_indecises = len(grille)
+
+    def __ajouter_contrainte(self, cases: List[Tuple[int, int]], mini: int, maxi: int):
+        indice = len(self.contraintes)
+        self.contraintes.append((cases, mini, maxi))
+        for case in cases:
+            self.par_case[case].append(indice)
+        self.a_verifier.add(indice)
+
+    def __compter(self, case: Tuple[int, int], sens: int):
+        # retire (sens = -1) ou ajoute (sens = 1) la case aux compteurs de la contrainte globale
+        if case in self.vues:
+            if self.vues[case] in PERSONNES:
+                self.nb_personnes += sens
+        elif case in self.personnes:
+            if self.personnes[case]:
+                self.nb_personnes += sens
+                self.nb_personnes_deduites += sens
+        else:
+            self.nb_indecises += sens
+
+    def __deduire(self, case: Tuple[int, int], deduit: bool):
+        self.__compter(case, -1)
+        self.personnes[case] = deduit
+        self.__compter(case, 1)
+        self.a_verifier.update(self.par_case[case])
+
+    def voir(self, vision: List[Tuple[Tuple[int, int], HC]]):
+        for case, valeur in vision:
+            if self.vues.get(case) != valeur.value:
+                self.__compter(case, -1)
+                self.vues[case] = valeur.value
+                self.__compter(case, 1)
+                if valeur.value in OBJETS:
+                    self.objets_vus.add(valeur.value)
+                self.a_verifier.update(self.par_case[case])
+
+    def entendre(self, position: Tuple[int, int], bruit: int):
+        # le nombre entendu ne dépend que de la position, une seule contrainte par position suffit
+        if position in self.ecoutes:
+            return
+        self.ecoutes.add(position)
+        cases = [(x, y)
+                 for x in range(position[0] - PORTEE_OUIE, position[0] + PORTEE_OUIE + 1)
+                 for y in range(position[1] - PORTEE_OUIE, position[1] + PORTEE_OUIE + 1)
+                 if (x, y) in self.grille]
+        self.__ajouter_contrainte(cases, bruit, bruit if bruit < OUIE_MAX else len(cases))
+        self.propager()
+
+    def statut(self, case: Tuple[int, int]) -> Optional[bool]:
+        """True si la case contient une personne, False si elle n'en contient pas, None si on ne sait pas."""
+        if case in self.vues:
+            return self.vues[case] in PERSONNES
+        return self.personnes.get(case)
+
+    def propager(self):
+        while True:
+            while self.a_verifier:
+                cases, mini, maxi = self.contraintes[self.a_verifier.pop()]
+                nb_personnes, libres = 0, []
+                for case in cases:
+                    statut = self.statut(case)
+                    if statut is None:
+                        libres.append(case)
+                    elif statut:
+                        nb_personnes += 1
+                if not libres:
+                    continue
+                if nb_personnes == maxi:
+                    deduit = False
+                elif nb_personnes + len(libres) == mini:
+                    deduit = True
+                else:
+                    continue
+                for case in libres:
+                    self.__deduire(case, deduit)
+
+            # contrainte globale, la carte n'est parcourue que quand elle décide toutes les cases indécises
+            if self.nb_indecises == 0:
+                return
+            if self.nb_personnes == self.total_personnes:
+                deduit = False
+            elif self.nb_personnes + self.nb_indecises == self.total_personnes:
+                deduit = True
+            else:
+                return
+            for case in self.grille:
+                if case not in self.vues and case not in self.personnes:
+                    self.__deduire(case, deduit)
+
+    def carte_deduite(self) -> bool:
+        """True quand les trois objets ont été vus et qu'aucune case pas encore vue ne peut contenir de personne :
+        il ne reste alors que des cases vides ou des murs, que ni l'ouïe ni les comptes ne distinguent."""
+        self.propager()
+        return len(self.objets_vus) == len(OBJETS) and self.nb_indecises == 0 and self.nb_personnes_deduites == 0
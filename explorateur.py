@@ -1,10 +1,16 @@
-import math
 import random
 from enum import Enum
 from typing import List, Tuple, Dict, Callable, Optional
 
+import numpy as np
+
+from deduction import Deduction
 from dimacs import Dimacs
 from hitman.hitman import HitmanReferee, HC
+from replanificateur import DStarLite
+from utils.GrilleConnaissance import GrilleConnaissance, OFFSETS_ORIENTATION, REGARD_GARDES, ROTATION_HORAIRE, \
+    ROTATION_ANTI_HORAIRE
+from utils.LRUCache import LRUCache
 from utils.PriorityQueue import PriorityQueue
 
 
@@ -14,10 +20,65 @@ class MOVE_RESULT(Enum):
     UNREACHABLE_GOAL = 3,
 
 
+CIVILS = (HC.CIVIL_N.value, HC.CIVIL_E.value, HC.CIVIL_S.value, HC.CIVIL_W.value)
+
+
+def _decale(tableau: np.ndarray, dx: int, dy: int) -> np.ndarray:
+    # resultat[x, y] = tableau[x + dx, y + dy], False (ou 0) hors de la carte
+    n, m = tableau.shape
+    resultat = np.zeros_like(tableau)
+    resultat[max(0, -dx):n - max(0, dx), max(0, -dy):m - max(0, dy)] = \
+        tableau[max(0, dx):n + min(0, dx), max(0, dy):m + min(0, dy)]
+    return resultat
+
+
+def _propager(depart: np.ndarray, continuer: np.ndarray, dx: int, dy: int) -> np.ndarray:
+    # resultat[c] = depart[c] or (continuer[c] and resultat[c + (dx, dy)]), calculé ligne par ligne
+    resultat = depart.copy()
+    if dx != 0:
+        lignes = range(resultat.shape[0] - 2, -1, -1) if dx > 0 else range(1, resultat.shape[0])
+        for x in lignes:
+            resultat[x] |= continuer[x] & resultat[x + dx]
+    else:
+        colonnes = range(resultat.shape[1] - 2, -1, -1) if dy > 0 else range(1, resultat.shape[1])
+        for y in colonnes:
+            resultat[:, y] |= continuer[:, y] & resultat[:, y + dy]
+    return resultat
+
+
+def _distances(arret: np.ndarray, dx: int, dy: int) -> np.ndarray:
+    # resultat[c] = 0 si arret[c], sinon 1 + resultat[c + (dx, dy)]
+    resultat = np.zeros(arret.shape, dtype=np.int32)
+    if dx != 0:
+        lignes = range(resultat.shape[0] - 2, -1, -1) if dx > 0 else range(1, resultat.shape[0])
+        for x in lignes:
+            resultat[x] = np.where(arret[x], 0, 1 + resultat[x + dx])
+    else:
+        colonnes = range(resultat.shape[1] - 2, -1, -1) if dy > 0 else range(1, resultat.shape[1])
+        for y in colonnes:
+            resultat[:, y] = np.where(arret[:, y], 0, 1 + resultat[:, y + dy])
+    return resultat
+
+
 class Explorateur:
     def __init__(self, referre: HitmanReferee, init_status: Dict, phase: int, debug: bool = False,
-                 with_dimacs: bool = False):
+                 with_dimacs: bool = False, queue_type: type = PriorityQueue, taille_cache: int = 4096,
+                 mode_saut: bool = False, mode_bidirectionnel: bool = False, mode_replanification: bool = False,
+                 mode_gain: bool = False):
         self.referre = referre
+        # PriorityQueue (tas) ou BucketPriorityQueue (seaux, priorités entières) pour les recherches
+        self.queue_type = queue_type
+        # search_a_star_oriente saute les lignes droites de cases sans pénalité (jump point search), seule la
+        # phase 2 s'en sert : la phase 1 cherche ses cibles avec search_dijkstra_multi
+        self.mode_saut = mode_saut
+        # search_a_star_oriente cherche depuis le départ et depuis le but en même temps (prioritaire sur mode_saut)
+        self.mode_bidirectionnel = mode_bidirectionnel
+        # move_to_goal ignore le chemin donné et replanifie à chaque pas avec D* Lite (replanificateur.py)
+        self.mode_replanification = mode_replanification
+        # exploration par points de vue (search_point_de_vue) : plus de tour d'horizon après chaque pas
+        self.mode_gain = mode_gain
+        # nombre d'états développés par les recherches A*, pour comparer les modes
+        self.noeuds_developpes: int = 0
         self.total_x: int = init_status["n"]
         self.total_y: int = init_status["m"]
         self.position: Tuple[int, int] = init_status["position"]
@@ -27,7 +88,13 @@ class Explorateur:
         self.old_penalties: int = 0
         self.moves: int = 0
         self.explored_node = [(0, 0)]
-        self.cases_connues: Dict[Tuple[int, int], int] = {}
+        # -1 pour une case inconnue, la grille tient aussi à jour le nombre de gardes qui voient chaque case
+        self.cases_connues: GrilleConnaissance = GrilleConnaissance(self.total_x, self.total_y)
+        # Chemins orientés de la phase 2 et tables de saut déjà calculés, la version de cases_connues fait
+        # partie de la clé : dès qu'une case change, les anciennes entrées ne sont plus jamais relues et
+        # finissent évincées. La recherche multi-cibles de la phase 1 n'est pas mise en cache, ses cibles
+        # changent à chaque pas.
+        self.cache_chemins = LRUCache(taille_cache)
         self.phase = phase
         self.use_dimacs = with_dimacs
         if self.phase == 1 and with_dimacs:
@@ -36,8 +103,13 @@ class Explorateur:
         # ADD DEBUG VAR
         self.debug = debug
         # Ajout condition initale.
+        if self.phase == 1:
+            # ce que la vision, l'ouïe et les nombres de gardes / civils prouvent sur les cases inconnues
+            self.deduction = Deduction(self.cases_connues, init_status["guard_count"], init_status["civil_count"])
         self.add_case_connue_vision([(self.position, HC.EMPTY)])
         self.add_case_connue_vision(init_status["vision"])
+        if self.phase == 1:
+            self.deduction.entendre(self.position, init_status["hear"])
         self.translation_dict: Dict[HC, HC] = {HC.E: HC.GUARD_E, HC.W: HC.GUARD_W, HC.N: HC.GUARD_N,
                                                   HC.S: HC.GUARD_S}
 
@@ -50,24 +122,355 @@ class Explorateur:
         if current_orientation is None:
             current_orientation = self.orientation
 
-        frontier = PriorityQueue()
+        frontier = self.queue_type()
         frontier.push(current_pos, self.heuristique_manhattan(current_pos, goal))
         save = {current_pos: None}
-        start_pos = current_pos
+        # coût réel depuis le départ et orientation à l'arrivée sur chaque case
+        g_score: Dict[Tuple[int, int], int] = {current_pos: 0}
+        orientations: Dict[Tuple[int, int], HC] = {current_pos: current_orientation}
+        fermes = set()
 
         while not frontier.isEmpty():
             current_state = frontier.pop()
+            if current_state in fermes:
+                continue
+            if current_state == goal:
+                return current_state, save
+            fermes.add(current_state)
             for temp in successor(current_state):
-                if temp not in save:
+                if temp in fermes:
+                    continue
+                cout, orientation = self.get_move_needed(current_state, orientations[current_state], temp)
+                nouveau_g = g_score[current_state] + cout
+                if temp not in g_score or nouveau_g < g_score[temp]:
+                    g_score[temp] = nouveau_g
+                    orientations[temp] = orientation
                     save[temp] = current_state
-                    if goal == temp:
-                        return temp, save
-                    state_add_infos = self.get_move_needed(current_state, current_orientation, goal)
-                    current_orientation = state_add_infos[1]
-                    heursitique = self.heuristique_manhattan(temp, goal) + state_add_infos[0] + self.reconstruire_chemin(save, start_pos, temp).__len__()
-                    frontier.push(temp, heursitique)
+                    frontier.push(temp, nouveau_g + self.heuristique_manhattan(temp, goal))
         return None, save
 
+    def search_a_star_oriente(self, goal: Tuple[int, int], current_pos: Tuple[int, int] = None,
+                              current_orientation: HC = None, suit_on: bool = False) \
+            -> Tuple[List[Tuple[int, int]], int]:
+        # Recherche A* sur les états (case, orientation, costume) avec les coûts exacts de l'arbitre :
+        # un tour coûte 1 + 5 par garde qui voit la case courante, un pas 1 + 5 par garde qui voit la
+        # case d'arrivée. Le costume ne change pas pendant un trajet, il est donc fixé pour toute la recherche.
+        if current_pos is None:
+            current_pos = self.position
+        if current_orientation is None:
+            current_orientation = self.orientation
+
+        cle = ("oriente", current_pos, current_orientation, goal, suit_on, self.mode_saut, self.mode_bidirectionnel,
+               self.cases_connues.version)
+        resultat = self.cache_chemins.get(cle)
+        if resultat is None and self.mode_bidirectionnel:
+            resultat = self.__search_bidirectionnel(goal, current_pos, current_orientation, suit_on)
+            self.cache_chemins.put(cle, resultat)
+        elif resultat is None:
+            resultat = self.__search_a_star_oriente(goal, current_pos, current_orientation, suit_on)
+            self.cache_chemins.put(cle, resultat)
+        return list(resultat[0]), resultat[1]
+
+    def __search_a_star_oriente(self, goal: Tuple[int, int], current_pos: Tuple[int, int],
+                                current_orientation: HC, suit_on: bool) -> Tuple[List[Tuple[int, int]], int]:
+        if self.mode_saut:
+            neutres, distances = self.tables_de_saut(suit_on)
+        depart = (current_pos, current_orientation)
+        frontier = self.queue_type()
+        frontier.push(depart, self.heuristique_manhattan(current_pos, goal))
+        save: Dict[Tuple[Tuple[int, int], HC], Optional[Tuple[Tuple[int, int], HC]]] = {depart: None}
+        g_score: Dict[Tuple[Tuple[int, int], HC], int] = {depart: 0}
+        fermes = set()
+
+        while not frontier.isEmpty():
+            etat = frontier.pop()
+            if etat in fermes:
+                continue
+            pos, orientation = etat
+            if pos == goal:
+                return self.reconstruire_chemin_oriente(save, etat), g_score[etat]
+            fermes.add(etat)
+            self.noeuds_developpes += 1
+
+            cout_tour = 1 + self.cout_surveillance(pos, suit_on)
+            voisins = [((pos, ROTATION_HORAIRE[orientation]), cout_tour),
+                       ((pos, ROTATION_ANTI_HORAIRE[orientation]), cout_tour)]
+            offset_x, offset_y = self.get_offset(orientation)
+            devant = pos[0] + offset_x, pos[1] + offset_y
+            if self.mode_saut and 0 <= devant[0] < self.total_x and 0 <= devant[1] < self.total_y and \
+                    neutres[devant[0]][devant[1]]:
+                # ligne droite de cases neutres jusqu'au prochain point de saut ou à l'alignement avec le but
+                pas = 1 + distances[(offset_x, offset_y)][devant[0]][devant[1]]
+                alignement = (goal[0] - pos[0]) * offset_x + (goal[1] - pos[1]) * offset_y
+                if alignement >= 1:
+                    pas = min(pas, alignement)
+                voisins.append((((pos[0] + pas * offset_x, pos[1] + pas * offset_y), orientation), pas))
+            elif 0 <= devant[0] < self.total_x and 0 <= devant[1] < self.total_y and self.is_case_safe(devant):
+                voisins.append(((devant, orientation), 1 + self.cout_surveillance(devant, suit_on)))
+
+            for suivant, cout in voisins:
+                if suivant in fermes:
+                    continue
+                nouveau_g = g_score[etat] + cout
+                if suivant not in g_score or nouveau_g < g_score[suivant]:
+                    g_score[suivant] = nouveau_g
+                    save[suivant] = etat
+                    frontier.push(suivant, nouveau_g + self.heuristique_manhattan(suivant[0], goal))
+        return [], 0
+
+    def reconstruire_chemin_oriente(self, save: Dict, etat: Tuple[Tuple[int, int], HC]) -> List[Tuple[int, int]]:
+        # cases traversées du départ jusqu'à etat, en suivant les parents d'une recherche sur les états orientés
+        chemin = []
+        while etat is not None:
+            if chemin and chemin[-1] != etat[0]:
+                # en mode saut deux états successifs peuvent être séparés par une ligne droite
+                dx = (etat[0][0] > chemin[-1][0]) - (etat[0][0] < chemin[-1][0])
+                dy = (etat[0][1] > chemin[-1][1]) - (etat[0][1] < chemin[-1][1])
+                while chemin[-1] != etat[0]:
+                    chemin.append((chemin[-1][0] + dx, chemin[-1][1] + dy))
+            elif not chemin:
+                chemin.append(etat[0])
+            etat = save[etat]
+        chemin.reverse()
+        return chemin
+
+    def search_dijkstra_multi(self, cibles, current_pos: Tuple[int, int] = None, current_orientation: HC = None,
+                              suit_on: bool = False) -> Tuple[Dict[Tuple[int, int], int], Dict, Dict]:
+        # Un seul Dijkstra depuis (case, orientation) avec les coûts de search_a_star_oriente, arrêté dès que
+        # toutes les cibles atteignables ont leur coût. Renvoie le coût de chaque case atteinte, les parents
+        # et l'état par lequel chaque case a été atteinte, pour reconstruire_chemin_oriente.
+        if current_pos is None:
+            current_pos = self.position
+        if current_orientation is None:
+            current_orientation = self.orientation
+
+        depart = (current_pos, current_orientation)
+        frontier = self.queue_type()
+        frontier.push(depart, 0)
+        save: Dict[Tuple[Tuple[int, int], HC], Optional[Tuple[Tuple[int, int], HC]]] = {depart: None}
+        g_score: Dict[Tuple[Tuple[int, int], HC], int] = {depart: 0}
+        fermes = set()
+        couts: Dict[Tuple[int, int], int] = {}
+        arrivees: Dict[Tuple[int, int], Tuple[Tuple[int, int], HC]] = {}
+        restantes = set(cibles)
+
+        while not frontier.isEmpty() and restantes:
+            etat = frontier.pop()
+            if etat in fermes:
+                continue
+            fermes.add(etat)
+            self.noeuds_developpes += 1
+            pos, orientation = etat
+            if pos not in couts:
+                couts[pos] = g_score[etat]
+                arrivees[pos] = etat
+                restantes.discard(pos)
+
+            cout_tour = 1 + self.cout_surveillance(pos, suit_on)
+            voisins = [((pos, ROTATION_HORAIRE[orientation]), cout_tour),
+                       ((pos, ROTATION_ANTI_HORAIRE[orientation]), cout_tour)]
+            offset_x, offset_y = self.get_offset(orientation)
+            devant = pos[0] + offset_x, pos[1] + offset_y
+            if 0 <= devant[0] < self.total_x and 0 <= devant[1] < self.total_y and self.is_case_safe(devant):
+                voisins.append(((devant, orientation), 1 + self.cout_surveillance(devant, suit_on)))
+
+            for suivant, cout in voisins:
+                if suivant in fermes:
+                    continue
+                nouveau_g = g_score[etat] + cout
+                if suivant not in g_score or nouveau_g < g_score[suivant]:
+                    g_score[suivant] = nouveau_g
+                    save[suivant] = etat
+                    frontier.push(suivant, nouveau_g)
+        return couts, save, arrivees
+
+    def search_point_de_vue(self, gains: Dict[Tuple[int, int], np.ndarray], current_pos: Tuple[int, int] = None,
+                            current_orientation: HC = None, suit_on: bool = False) \
+            -> Tuple[Optional[Tuple[Tuple[int, int], HC]], Dict]:
+        # Dijkstra sur les états orientés jusqu'au premier état (case connue praticable, orientation) dont le
+        # regard montre au moins une case inconnue d'après gains ; entre états de même coût, celui qui en montre
+        # le plus. Classer par cases vues / coût faisait aller loin pour 3 cases en laissant derrière des cases
+        # isolées proches, qu'il fallait revenir chercher.
+        if current_pos is None:
+            current_pos = self.position
+        if current_orientation is None:
+            current_orientation = self.orientation
+        depart = (current_pos, current_orientation)
+        frontier = self.queue_type()
+        frontier.push(depart, 0)
+        save: Dict[Tuple[Tuple[int, int], HC], Optional[Tuple[Tuple[int, int], HC]]] = {depart: None}
+        g_score: Dict[Tuple[Tuple[int, int], HC], int] = {depart: 0}
+        fermes = set()
+        meilleur, meilleur_gain, meilleur_cout = None, 0, 0
+
+        while not frontier.isEmpty():
+            etat = frontier.pop()
+            if etat in fermes:
+                continue
+            g = g_score[etat]
+            if meilleur is not None and g > meilleur_cout:
+                break
+            fermes.add(etat)
+            self.noeuds_developpes += 1
+            pos, orientation = etat
+            if g > 0 and self.cases_connues[pos] != -1 and self.is_case_safe(pos):
+                gain = int(gains[self.get_offset(orientation)][pos])
+                if gain > meilleur_gain:
+                    meilleur, meilleur_gain, meilleur_cout = etat, gain, g
+
+            cout_tour = 1 + self.cout_surveillance(pos, suit_on)
+            voisins = [((pos, ROTATION_HORAIRE[orientation]), cout_tour),
+                       ((pos, ROTATION_ANTI_HORAIRE[orientation]), cout_tour)]
+            offset_x, offset_y = self.get_offset(orientation)
+            devant = pos[0] + offset_x, pos[1] + offset_y
+            if 0 <= devant[0] < self.total_x and 0 <= devant[1] < self.total_y and self.is_case_safe(devant):
+                voisins.append(((devant, orientation), 1 + self.cout_surveillance(devant, suit_on)))
+
+            for suivant, cout in voisins:
+                if suivant in fermes:
+                    continue
+                nouveau_g = g + cout
+                if suivant not in g_score or nouveau_g < g_score[suivant]:
+                    g_score[suivant] = nouveau_g
+                    save[suivant] = etat
+                    frontier.push(suivant, nouveau_g)
+        return meilleur, save
+
+    def __search_bidirectionnel(self, goal: Tuple[int, int], current_pos: Tuple[int, int],
+                                current_orientation: HC, suit_on: bool) -> Tuple[List[Tuple[int, int]], int]:
+        # A* bidirectionnel sur les mêmes états et coûts que __search_a_star_oriente. La recherche arrière part
+        # des 4 orientations sur le but et remonte les arcs à l'envers : un tour sur q coûte toujours 1 + w(q),
+        # et l'état (q, o) est atteint par un pas depuis q - o, pour 1 + w(q). Les deux côtés utilisent le
+        # potentiel moyen (h_but - h_depart) / 2, doublé pour garder des priorités entières, qui garde des coûts
+        # réduits positifs : on peut s'arrêter dès que les deux sommets de file dépassent le meilleur chemin.
+        constante = self.heuristique_manhattan(current_pos, goal)
+
+        def potentiel(pos: Tuple[int, int]) -> int:
+            return self.heuristique_manhattan(pos, goal) - self.heuristique_manhattan(pos, current_pos)
+
+        depart = (current_pos, current_orientation)
+        g_score = [{depart: 0}, {(goal, orientation): 0 for orientation in ROTATION_HORAIRE}]
+        save = [{depart: None}, {(goal, orientation): None for orientation in ROTATION_HORAIRE}]
+        fermes = [set(), set()]
+        signe = [1, -1]
+        frontiers = [self.queue_type(), self.queue_type()]
+        for cote in (0, 1):
+            for etat in g_score[cote]:
+                frontiers[cote].push(etat, signe[cote] * potentiel(etat[0]) + constante)
+        sommets = [0, 0]
+        meilleur, rencontre = None, None
+        if depart in g_score[1]:
+            meilleur, rencontre = 0, depart
+
+        cote = 1
+        while not frontiers[0].isEmpty() and not frontiers[1].isEmpty():
+            cote = 1 - cote
+            etat = frontiers[cote].pop()
+            if etat in fermes[cote]:
+                continue
+            fermes[cote].add(etat)
+            self.noeuds_developpes += 1
+            sommets[cote] = 2 * g_score[cote][etat] + signe[cote] * potentiel(etat[0]) + constante
+            if meilleur is not None and sommets[0] + sommets[1] >= 2 * (meilleur + constante):
+                break
+
+            pos, orientation = etat
+            offset_x, offset_y = self.get_offset(orientation)
+            if cote == 0:
+                cout_tour = 1 + self.cout_surveillance(pos, suit_on)
+                voisins = [((pos, ROTATION_HORAIRE[orientation]), cout_tour),
+                           ((pos, ROTATION_ANTI_HORAIRE[orientation]), cout_tour)]
+                devant = pos[0] + offset_x, pos[1] + offset_y
+                if 0 <= devant[0] < self.total_x and 0 <= devant[1] < self.total_y and self.is_case_safe(devant):
+                    voisins.append(((devant, orientation), 1 + self.cout_surveillance(devant, suit_on)))
+            else:
+                cout = 1 + self.cout_surveillance(pos, suit_on)
+                voisins = [((pos, ROTATION_HORAIRE[orientation]), cout),
+                           ((pos, ROTATION_ANTI_HORAIRE[orientation]), cout)]
+                derriere = pos[0] - offset_x, pos[1] - offset_y
+                if derriere == current_pos or self.is_case_safe(derriere):
+                    voisins.append(((derriere, orientation), cout))
+
+            for suivant, cout in voisins:
+                if suivant in fermes[cote]:
+                    continue
+                nouveau_g = g_score[cote][etat] + cout
+                if suivant not in g_score[cote] or nouveau_g < g_score[cote][suivant]:
+                    g_score[cote][suivant] = nouveau_g
+                    save[cote][suivant] = etat
+                    frontiers[cote].push(suivant, 2 * nouveau_g + signe[cote] * potentiel(suivant[0]) + constante)
+                    if suivant in g_score[1 - cote] and \
+                            (meilleur is None or nouveau_g + g_score[1 - cote][suivant] < meilleur):
+                        meilleur, rencontre = nouveau_g + g_score[1 - cote][suivant], suivant
+
+        if meilleur is None:
+            return [], 0
+        # départ -> rencontre par les parents de la recherche avant, puis rencontre -> but par la recherche arrière
+        etats = []
+        etat = rencontre
+        while etat is not None:
+            etats.append(etat)
+            etat = save[0][etat]
+        etats.reverse()
+        etat = save[1][rencontre]
+        while etat is not None:
+            etats.append(etat)
+            etat = save[1][etat]
+        chemin = []
+        for etat in etats:
+            if not chemin or chemin[-1] != etat[0]:
+                chemin.append(etat[0])
+        return chemin, meilleur
+
+    def tables_de_saut(self, suit_on: bool) -> Tuple[List[List[bool]], Dict[Tuple[int, int], List[List[int]]]]:
+        # Pour le mode saut : les cases neutres (connues, praticables, aucune action pénalisée) et, pour chaque
+        # direction, le nombre de cases neutres qu'on peut enchaîner depuis chaque case avant un point de saut.
+        # Ces tables ne dépendent pas du but, elles sont gardées dans le cache tant que cases_connues ne change pas.
+        cle = ("tables_saut", suit_on, self.cases_connues.version)
+        tables = self.cache_chemins.get(cle)
+        if tables is None:
+            tables = self.__calculer_tables_de_saut(suit_on)
+            self.cache_chemins.put(cle, tables)
+        return tables
+
+    def __calculer_tables_de_saut(self, suit_on: bool):
+        praticables = self.cases_connues.masque_praticable()
+        neutres = praticables & ~self.cases_connues.masque_inconnu()
+        if not suit_on:
+            neutres &= ~self.cases_connues.masque_surveille() | self.cases_connues.masque_civils()
+
+        # balayage perpendiculaire : en avançant dans p depuis une case, trouve-t-on une case neutre avec un
+        # voisin forcé, ou une case praticable non neutre (surveillée, inconnue) au bout de la ligne ?
+        balayages = {}
+        for px, py in REGARD_GARDES.values():
+            sx, sy = py, px
+            force = (_decale(neutres, sx, sy) != _decale(neutres, sx - px, sy - py)) | \
+                    (_decale(neutres, -sx, -sy) != _decale(neutres, -sx - px, -sy - py))
+            suivante_neutre = _decale(neutres, px, py)
+            trouve = _propager(neutres & (force | (~suivante_neutre & _decale(praticables, px, py))),
+                               neutres & suivante_neutre, px, py)
+            balayages[(px, py)] = _decale(np.where(neutres, trouve, praticables), px, py)
+
+        distances = {}
+        for dx, dy in REGARD_GARDES.values():
+            px, py = dy, dx
+            # pos est un point de saut si on y arrive depuis une case non neutre (un demi-tour y est moins cher),
+            # si elle a un voisin forcé ou si un balayage perpendiculaire trouve quelque chose
+            point_de_saut = ~_decale(neutres, -dx, -dy) | \
+                (_decale(neutres, px, py) != _decale(neutres, px - dx, py - dy)) | \
+                (_decale(neutres, -px, -py) != _decale(neutres, -px - dx, -py - dy)) | \
+                balayages[(px, py)] | balayages[(-px, -py)]
+            arret = point_de_saut | ~_decale(neutres, dx, dy)
+            distances[(dx, dy)] = _distances(arret, dx, dy).tolist()
+        return neutres.tolist(), distances
+
+    def cout_surveillance(self, pos: Tuple[int, int], suit_on: bool = False) -> int:
+        # Pénalité de l'arbitre pour une action faite sur pos : un garde ne voit pas à travers le costume
+        # ni Hitman caché sur la case d'un civil
+        if suit_on or self.cases_connues.get(pos, -1) in CIVILS:
+            return 0
+        return 5 * self.is_guard_watching_case(pos)
+
     def reconstruire_chemin(self, came_from: Dict[Tuple[int, int], Tuple[int, int]],
                             start: Tuple[int, int], goal: Tuple[int, int]) -> List[Tuple[int, int]]:
         current: Tuple[int, int] = goal
@@ -81,30 +484,13 @@ class Explorateur:
         path.reverse()
         return path
 
-    def heuristique_manhattan(self, init: Tuple[int, int], goal: Tuple[int, int]) -> float:
-        return math.sqrt((goal[0] - init[0]) ** 2 + (goal[1] - init[1]) ** 2)
-
-    def get_path(self, goal: Tuple[int, int], safe_path: bool, start: Tuple[int, int] = None,
-                 init_orientation: HC = None) -> Tuple[List[Tuple[int, int]], float]:
-        if start is None:
-            start = self.position
-        if init_orientation is None:
-            init_orientation = self.orientation
-        if safe_path:
-            path = self.search_a_star_sauvgarde_etat(goal=goal, successor=self.get_safe_succ, current_pos=start,
-                                                     current_orientation=init_orientation)
-        else:
-            path = self.search_a_star_sauvgarde_etat(goal=goal, successor=self.get_succ, current_pos=start,
-                                                     current_orientation=init_orientation)
-        chemin = self.reconstruire_chemin(path[1], start, goal)
-        path_cost = self.valuate_path(chemin, start, init_orientation)[0]
-        if len(chemin) > 0:
-            return chemin, path_cost
-        else:
-            return [], float("inf")
+    def heuristique_manhattan(self, init: Tuple[int, int], goal: Tuple[int, int]) -> int:
+        return abs(goal[0] - init[0]) + abs(goal[1] - init[1])
 
     def move_to_goal(self, goal: Tuple[int, int], path: List[Tuple[int, int]] = None) -> \
             Tuple[bool, MOVE_RESULT]:
+        if self.mode_replanification:
+            return self.__move_to_goal_replanifie(goal)
         try_to_reach = True
         while try_to_reach:
             self.decouvrir_voisins()
@@ -146,41 +532,12 @@ class Explorateur:
                             print(f"-------- DEBUG : ACTUAL-TARGET : {case}")
                             print(f"-------- DEBUG : CURRENT-CHEMIN : {goal}")
 
-                        status = self.referre.move()
-
-                        self.moves += 1
-                        self.old_penalties = self.penalties
-                        self.position = status["position"]
-                        self.orientation = status["orientation"]
-                        self.add_case_connue_vision(status["vision"])
-                        self.penalties = status["penalties"]
-                        self.is_guard_possible(status=status)
-                        self.noise = status["hear"]
-
-                        self.explored_node.append(self.position)
-                        if self.debug: self.print_status(status)
-
-                        if "Err: invalid move" in status["status"]:
-                            print("GAME OVER")
-                            self.print_map()
-                            raise Exception("INVALID MOVE - OVER")
-
-                        self.decouvrir_voisins()
+                        status = self.__avancer()
 
                         if self.phase == 1 and self.use_dimacs:
                             self.dimacs.handle_noise(status)
-                            if i + 1 >= 0 and i+1 < len(path):
-                                case_next = path[i + 1]
-                                possible_guard_pos, _ = self.get_guard_possible_cells(position=case_next)
-                                if self.debug :
-                                    print(f"\t CASE NEXT : {case_next}")
-                                    print(f"\t POSSIBLE GUARDS POS : {possible_guard_pos}")
-                                result = self.dimacs.test_is_cell_safe(self.cases_connues, status["hear"], self.position, possible_guard_pos)
-                                if result[0]:
-                                    # garde trouvé en result [1]
-                                    guard_orientation: HC = self.get_offest_from_dir(case_next, result[1])
-                                    guard_type: HC = self.translation_dict[guard_orientation]
-                                    self.cases_connues[result[1]] = guard_type.value
+                            if i + 1 < len(path):
+                                self.__verifier_case_suivante(status, path[i + 1])
 
             if self.phase == 1:
                 if self.cases_connues[goal] == -1:
@@ -188,6 +545,95 @@ class Explorateur:
                 else:
                     return True, MOVE_RESULT.GOAL_REACHED
 
+    def __move_to_goal_replanifie(self, goal: Tuple[int, int]) -> Tuple[bool, MOVE_RESULT]:
+        # Le chemin n'est pas figé : après chaque action, D* Lite répare son plan avec les cases que la vision
+        # vient de modifier au lieu de relancer une recherche complète
+        replanificateur = DStarLite(self, goal, (self.position, self.orientation), suit_on=False)
+        try:
+            self.decouvrir_voisins()
+            while True:
+                if self.phase == 1 and self.cases_connues[goal] != -1:
+                    return True, MOVE_RESULT.GOAL_REACHED
+                if self.phase == 2 and self.position == goal:
+                    return True, MOVE_RESULT.GOAL_REACHED
+                replanificateur.deplacer_depart((self.position, self.orientation))
+                replanificateur.prendre_en_compte_changements()
+                replanificateur.calculer()
+                suivant = replanificateur.prochain_etat()
+                if replanificateur.cout() == float("inf") or suivant is None:
+                    return False, MOVE_RESULT.UNREACHABLE_GOAL
+                case, orientation = suivant
+                if orientation != self.orientation:
+                    offset_x, offset_y = OFFSETS_ORIENTATION[orientation]
+                    self.trun_to_direction(goal=(self.position[0] + offset_x, self.position[1] + offset_y))
+                    continue
+                status = self.__avancer()
+                if self.phase == 1 and self.use_dimacs:
+                    self.dimacs.handle_noise(status)
+                    offset_x, offset_y = OFFSETS_ORIENTATION[self.orientation]
+                    case_next = self.position[0] + offset_x, self.position[1] + offset_y
+                    if case_next in self.cases_connues:
+                        self.__verifier_case_suivante(status, case_next)
+        finally:
+            self.noeuds_developpes += replanificateur.noeuds_developpes
+
+    def aller_au_point_de_vue(self, path: List[Tuple[int, int]], orientation: HC) -> bool:
+        # suit path puis se tourne vers orientation, False si une case du chemin s'avère dangereuse
+        for i in range(0, len(path)):
+            case = path[i]
+            if case == self.position:
+                continue
+            self.trun_to_direction(goal=case)
+            if not self.is_case_safe(case):
+                if self.debug: print("CASE_NOT_SAFE")
+                return False
+            status = self.__avancer()
+            if self.phase == 1 and self.use_dimacs:
+                self.dimacs.handle_noise(status)
+                if i + 1 < len(path):
+                    self.__verifier_case_suivante(status, path[i + 1])
+        offset_x, offset_y = self.get_offset(orientation)
+        self.trun_to_direction(goal=(self.position[0] + offset_x, self.position[1] + offset_y))
+        return True
+
+    def __avancer(self) -> Dict:
+        status = self.referre.move()
+
+        self.moves += 1
+        self.old_penalties = self.penalties
+        self.position = status["position"]
+        self.orientation = status["orientation"]
+        self.add_case_connue_vision(status["vision"])
+        self.penalties = status["penalties"]
+        self.is_guard_possible(status=status)
+        self.noise = status["hear"]
+        if self.phase == 1:
+            self.deduction.entendre(self.position, self.noise)
+
+        self.explored_node.append(self.position)
+        if self.debug: self.print_status(status)
+
+        if "Err: invalid move" in status["status"]:
+            print("GAME OVER")
+            self.print_map()
+            raise Exception("INVALID MOVE - OVER")
+
+        if not self.mode_gain:
+            self.decouvrir_voisins()
+        return status
+
+    def __verifier_case_suivante(self, status: Dict, case_next: Tuple[int, int]):
+        possible_guard_pos, _ = self.get_guard_possible_cells(position=case_next)
+        if self.debug :
+            print(f"\t CASE NEXT : {case_next}")
+            print(f"\t POSSIBLE GUARDS POS : {possible_guard_pos}")
+        result = self.dimacs.test_is_cell_safe(self.cases_connues, status["hear"], self.position, possible_guard_pos)
+        if result[0]:
+            # garde trouvé en result [1]
+            guard_orientation: HC = self.get_offest_from_dir(case_next, result[1])
+            guard_type: HC = self.translation_dict[guard_orientation]
+            self.cases_connues[result[1]] = guard_type.value
+
     def valuate_path(self, path: list[Tuple[int, int]], init_pos: Tuple[int, int], init_orientation: HC,
                      suit_on: bool = False) -> Tuple[int, HC]:
         penalties = 0
@@ -229,40 +675,21 @@ class Explorateur:
         return penalties, current_orientation
 
     def decouvrir_voisins(self, debug=False):
-        discovery_order: Dict[int, List[Tuple[int, int]]] = {}
-
-        voisNord = [(0, 1), (0, 2), (0, 3)]
-        voisEst = [(1, 0), (2, 0), (3, 0)]
-        voisSouth = [(0, -1), (0, -2), (0, -3)]
-        voisWest = [(-1, 0), (-2, 0), (-3, 0)]
-
+        # devant d'abord, puis est/nord, l'opposé et ouest/sud
         if self.orientation == HC.N:
-            discovery_order = {0: voisNord, 1: voisEst, 2: voisSouth, 3: voisWest}
+            discovery_order = [HC.N, HC.E, HC.S, HC.W]
         elif self.orientation == HC.S:
-            discovery_order = {0: voisSouth, 1: voisEst, 2: voisNord, 3: voisWest}
+            discovery_order = [HC.S, HC.E, HC.N, HC.W]
         elif self.orientation == HC.E:
-            discovery_order = {0: voisEst, 1: voisNord, 2: voisWest, 3: voisSouth}
-        elif self.orientation == HC.W:
-            discovery_order = {0: voisWest, 1: voisNord, 2: voisEst, 3: voisSouth}
-
-        for i in range(4):
-            voisins = discovery_order[i]
-            for j in range(3):
-                x, y = voisins[j]
-                if 0 <= j - 2 < len(voisins):
-                    pos_to_study = (self.position[0] + voisins[j - 2][0], self.position[1] + voisins[j - 2][1])
-                    if pos_to_study in self.cases_connues and (
-                            self.cases_connues[pos_to_study] != -1 or self.cases_connues[
-                        pos_to_study] != HC.EMPTY.value):
-                        break
-                if 0 <= j - 1 < len(voisins):
-                    pos_to_study = (self.position[0] + voisins[j - 1][0], self.position[1] + voisins[j - 1][1])
-                    if pos_to_study in self.cases_connues and (
-                            self.cases_connues[pos_to_study] != -1 or self.cases_connues[
-                        pos_to_study] != HC.EMPTY.value):
-                        break
-                pos_to_study = (self.position[0] + x, self.position[1] + y)
-                if pos_to_study in self.cases_connues and self.cases_connues[pos_to_study] == -1:
+            discovery_order = [HC.E, HC.N, HC.W, HC.S]
+        else:
+            discovery_order = [HC.W, HC.N, HC.E, HC.S]
+
+        # seule la case voisine est regardée, tourner pour une case inconnue plus loin sur le rayon coûte plus
+        # de pénalités qu'elle n'en fait gagner sur les cartes de test
+        for direction in discovery_order:
+            for pos_to_study in self.cases_connues.rayon_hitman(self.position, self.get_offset(direction))[:1]:
+                if self.cases_connues[pos_to_study] == -1:
                     self.trun_to_direction(goal=pos_to_study)
 
     def get_succ(self, pos_actuelle: Tuple[int, int]) -> List[Tuple[int, int]]:
@@ -270,7 +697,7 @@ class Explorateur:
         for (i, j) in [(0, 1), (1, 0), (-1, 0), (0, -1)]:  # HAUT BAS GAUCHE DROITE
             if 0 <= pos_actuelle[0] + i < self.total_x and 0 <= pos_actuelle[1] + j < self.total_y:
                 pos_to_study = (pos_actuelle[0] + i, pos_actuelle[1] + j)
-                if pos_to_study in self.cases_connues and self.is_case_safe(pos_to_study):
+                if self.is_case_safe(pos_to_study):
                     if pos_to_study not in succ:
                         succ.append(pos_to_study)
         return succ
@@ -287,77 +714,41 @@ class Explorateur:
                         succ.append(pos_to_study)
         return succ
 
-    def is_case_safe(self, pos: Tuple[int, int]):
-        if pos in self.cases_connues and self.cases_connues[pos] != HC.WALL.value and \
-                self.cases_connues[pos] != HC.GUARD_N.value and \
-                self.cases_connues[pos] != HC.GUARD_S.value and \
-                self.cases_connues[pos] != HC.GUARD_E.value and \
-                self.cases_connues[pos] != HC.GUARD_W.value:
-            return True
-        return False
+    def is_case_safe(self, pos: Tuple[int, int]) -> bool:
+        return self.cases_connues.est_praticable(pos)
 
     def is_case_in_path_without_penalities(self, pos: Tuple[int, int]):
         if self.is_case_safe(pos):
             return self.is_guard_watching_case(pos) == 0
         return False
 
-    def is_guard_watching_case(self, pos: Tuple[int, int]):
-        _, guards = self.get_guard_possible_cells(pos)
-        return len(guards)
+    def is_guard_watching_case(self, pos: Tuple[int, int]) -> int:
+        return self.cases_connues.nb_gardes_voyant(pos)
 
     # Renvoi un Tuple avec les positions possibles et les positions des gardes qui voient la position
     def get_guard_possible_cells(self, position: Tuple[int, int]) -> Tuple[
         List[Tuple[int, int]], List[Tuple[int, int]]]:
         pos_possible = []
         pos_guard = []
-        positions_possible = [(-1, 0), (-2, 0), (1, 0), (2, 0), (0, -1), (0, -2), (0, 1), (0, 2)]
-        translation_dict: Dict[HC, HC] = {HC.E: HC.GUARD_E, HC.W: HC.GUARD_W, HC.N: HC.GUARD_N,
-                                          HC.S: HC.GUARD_S}
-
-        for i in range(len(positions_possible)):
-            pos = position[0] + positions_possible[i][0], position[1] + positions_possible[i][1]
-            if 0 <= i - 1 < len(positions_possible) and (
-                    pos[0] == positions_possible[i - 1][0] or pos[1] == positions_possible[i - 1][1]):
-                # on est sur une case avt - vérifier si y a pas un objet dessus qui bloque la vue si c'est le cas pas besoin de traiter le cas car le garde ne peut pas nous voir.
-                pos_avt = positions_possible[i - 1]
-                if pos_avt in self.cases_connues and (
-                        self.cases_connues[pos_avt] != HC.EMPTY.value or self.cases_connues[pos_avt] != -1):
-                    # Le garde ne peut pas nous voir de cette position car il est bloqué par un objet. Si la case avant est inconnue il peut nous voir
-                    continue
-            if pos in self.cases_connues and self.cases_connues[pos] != -1:
-                guard_orientation: HC = self.get_offest_from_dir(position, pos)
-                guard_type: HC = translation_dict[guard_orientation]
-                if self.cases_connues[pos] == guard_type.value:
+        for direction in REGARD_GARDES.values():
+            for pos in self.cases_connues.rayon_gardes(position, direction):
+                valeur = self.cases_connues[pos]
+                if valeur == -1:
+                    pos_possible.append(pos)
+                elif valeur == self.translation_dict[self.get_offest_from_dir(position, pos)].value:
                     pos_guard.append(pos)
-            if pos in self.cases_connues and self.cases_connues[pos] == -1:
-                pos_possible.append(pos)
+                if self.cases_connues.bloque_vue(pos):
+                    # un garde plus loin ne peut pas nous voir à travers cette case
+                    break
         return pos_possible, pos_guard
 
     def get_visible_cells(self, position: Tuple[int, int]) -> List[Tuple[int, int]]:
+        # cases vides ou inconnues qu'on verrait depuis position dans les 4 directions, la vue s'arrête sur un objet
         pos_visible = []
-        positions_possible = [(-3, 0),(-2, 0), (-1, 0), (3, 0), (2, 0), (1, 0), (0, -3), (0, -2), (0, -1), (0, 3), (0, 2), (0, 1) ]
-
-        for i in range(len(positions_possible)):
-            pos = position[0] + positions_possible[i][0], position[1] + positions_possible[i][1]
-            if 0 <= i - 2 < len(positions_possible) and (
-                    pos[0] == positions_possible[i - 2][0] or pos[1] == positions_possible[i - 2][1]):
-                # on est sur une case avt - vérifier si n'y a pas un objet dessus qui bloque la vue si c'est le cas pas besoin de traiter le cas car le garde ne peut pas nous voir.
-                pos_avt = (positions_possible[i - 2][0] + position[0], positions_possible[i - 2][1] + position[1])
-                if pos_avt in self.cases_connues and (
-                        self.cases_connues[pos_avt] != HC.EMPTY.value or self.cases_connues[pos_avt] != -1):
-                    # Le garde ne peut pas nous voir de cette position car il est bloqué par un objet. Si la case avant est inconnue il peut nous voir
-                    continue
-            if 0 <= i - 1 < len(positions_possible) and (
-                    pos[0] == positions_possible[i - 1][0] or pos[1] == positions_possible[i - 1][1]):
-                # on est sur une case avt - vérifier si il n'y a pas un objet dessus qui bloque la vue si c'est le cas pas besoin de traiter le cas car le garde ne peut pas nous voir.
-                pos_avt = (positions_possible[i - 2][0] + position[0], positions_possible[i - 2][1] + position[1])
-                if pos_avt in self.cases_connues and (
-                        self.cases_connues[pos_avt] != HC.EMPTY.value or self.cases_connues[pos_avt] != -1):
-                    # Le garde ne peut pas nous voir de cette position car il est bloqué par un objet. Si la case avant est inconnue il peut nous voir
-                    continue
-            if pos in self.cases_connues and (
-                    self.cases_connues[pos] == HC.EMPTY.value or self.cases_connues[pos] == -1):
-                # Le garde ne peut pas nous voir de cette position car il est bloqué par un objet. Si la case avant est inconnue il peut nous voir
+        for direction in REGARD_GARDES.values():
+            for pos in self.cases_connues.rayon_hitman(position, direction):
+                if self.cases_connues.bloque_vue(pos):
+                    break
                 pos_visible.append(pos)
         return pos_visible
 
@@ -408,6 +799,8 @@ class Explorateur:
     def add_case_connue_vision(self, vision: Dict[Tuple[int, int], int]):
         if self.phase == 1 and self.use_dimacs:
             self.dimacs.handle_vision(vision)
+        if self.phase == 1:
+            self.deduction.voir(vision)
         for pos_case, value_case in vision:
             if pos_case in [3, 3]:
                 print("ici")
@@ -427,11 +820,11 @@ class Explorateur:
             self.moves += 1
         elif rotation[0] == "DOUBLE_TURN_CLOCKWISE":
             if self.debug: print("double turn")
-            nvlle_vision = self.referre.turn_clockwise()
+            # Les deux quarts de tour en un seul appel, on garde la vision intermédiaire
+            nvlle_vision, _, observations = self.referre.run_actions(["Turn Clockwise", "Turn Clockwise"])
             self.old_penalties = self.penalties
-            self.add_case_connue_vision(vision=nvlle_vision["vision"])
+            self.add_case_connue_vision(vision=observations[0][2])
             self.penalties = nvlle_vision["penalties"]
-            nvlle_vision = self.referre.turn_clockwise()
             self.moves += 2
         else:
             if self.debug: print("MOVE NOT NEEDED!")
@@ -497,14 +890,12 @@ class Explorateur:
 
     def get_map_infos_for_referee(self, debug = False):
         map_info: Dict[Tuple[int, int], HC] = {}
-        for i in range(self.total_y + 1):
-            for j in range(self.total_x + 1):
-                if (i, j) in self.cases_connues:
-                    if debug: print(f"({i}, {j}) : {self.cases_connues[(i, j)]}")
-                    if self.cases_connues[i, j] == -1:
-                        map_info[(i, j)] = HC.EMPTY
-                    else:
-                        map_info[(i, j)] = HC(self.cases_connues[(i, j)])
+        for pos in self.cases_connues:
+            if debug: print(f"{pos} : {self.cases_connues[pos]}")
+            if self.cases_connues[pos] == -1:
+                map_info[pos] = HC.EMPTY
+            else:
+                map_info[pos] = HC(self.cases_connues[pos])
         return map_info
 
     def get_move_needed(self, current_position: Tuple[int, int], current_orientation: HC, goal: Tuple[int, int]) -> \
@@ -0,0 +1,96 @@
+import random
+import sys
+from collections import deque
+from typing import List, Tuple
+
+from hitman.hitman import HC, save_world
+
+GARDES = [HC.GUARD_N, HC.GUARD_E, HC.GUARD_S, HC.GUARD_W]
+CIVILS = [HC.CIVIL_N, HC.CIVIL_E, HC.CIVIL_S, HC.CIVIL_W]
+
+
+def generer_monde(n: int, m: int, graine: int = 0, densite_murs: float = 0.2,
+                  densite_gardes: float = 0.02, densite_civils: float = 0.02,
+                  essais_max: int = 100) -> List[List[HC]]:
+    """Génère une carte au format de world_example (rangée du haut en premier).
+
+    La même graine donne toujours la même carte. La case (0, 0) est vide et la cible,
+    le costume et la corde à piano (un de chaque) sont atteignables depuis (0, 0).
+    """
+    if n * m < 4:
+        raise ValueError("CARTE_TROP_PETITE")
+    rng = random.Random(graine)
+    for _ in range(essais_max):
+        cases = {}
+        for x in range(n):
+            for y in range(m):
+                tirage = rng.random()
+                if tirage < densite_murs:
+                    cases[(x, y)] = HC.WALL
+                elif tirage < densite_murs + densite_gardes:
+                    cases[(x, y)] = rng.choice(GARDES)
+                elif tirage < densite_murs + densite_gardes + densite_civils:
+                    cases[(x, y)] = rng.choice(CIVILS)
+                else:
+                    cases[(x, y)] = HC.EMPTY
+        cases[(0, 0)] = HC.EMPTY
+
+        # Les objectifs sont posés sur des cases vides atteignables depuis (0, 0)
+        libres = [pos for pos in cases_atteignables(cases, n, m) if pos != (0, 0) and cases[pos] == HC.EMPTY]
+        if len(libres) < 3:
+            continue
+        for pos, objectif in zip(rng.sample(libres, 3), [HC.TARGET, HC.SUIT, HC.PIANO_WIRE]):
+            cases[pos] = objectif
+        return [[cases[(x, m - y - 1)] for x in range(n)] for y in range(m)]
+    raise ValueError("AUCUNE_CARTE_VALIDE")
+
+
+def cases_atteignables(cases, n: int, m: int) -> List[Tuple[int, int]]:
+    # Parcours en largeur depuis (0, 0), les murs et les gardes bloquent le passage
+    vues = {(0, 0)}
+    file = deque([(0, 0)])
+    ordre = []
+    while file:
+        x, y = file.popleft()
+        ordre.append((x, y))
+        for (i, j) in [(0, 1), (1, 0), (-1, 0), (0, -1)]:
+            voisin = (x + i, y + j)
+            if 0 <= voisin[0] < n and 0 <= voisin[1] < m and voisin not in vues and \
+                    cases[voisin] != HC.WALL and cases[voisin] not in GARDES:
+                vues.add(voisin)
+                file.append(voisin)
+    return ordre
+
+
+def print_help():
+    print("Usage: python3 generateur.py <n> <m> <graine> <fichier> [args]")
+    print("Args:")
+    print("\t--murs=<densité> : proportion de murs, 0.2 par défaut")
+    print("\t--gardes=<densité> : proportion de gardes, 0.02 par défaut")
+    print("\t--civils=<densité> : proportion de civils, 0.02 par défaut")
+    print("\t--binaire : écrit la carte au format binaire")
+
+
+def main(args):
+    if len(args) < 4:
+        print_help()
+        return
+    densites = {"--murs": 0.2, "--gardes": 0.02, "--civils": 0.02}
+    binaire = False
+    for arg in args[4:]:
+        nom, _, valeur = arg.partition("=")
+        if nom in densites and valeur:
+            densites[nom] = float(valeur)
+        elif arg == "--binaire":
+            binaire = True
+        else:
+            print("Argument inconnu : " + arg)
+            print_help()
+            return
+    monde = generer_monde(int(args[0]), int(args[1]), int(args[2]), densites["--murs"], densites["--gardes"],
+                          densites["--civils"])
+    save_world(monde, args[3], binary=binaire)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -6,10 +6,14 @@ __maintainer__ = "Sylvain Lagrue"
 __email__ = "sylvain.lagrue@utc.fr"
 __status__ = "dev"
 
+from array import array
+from collections.abc import Mapping
 from enum import Enum
-from itertools import product
+from itertools import accumulate, product, repeat
 from typing import List, Tuple, Dict
+import struct
 import sys
+import weakref
 
 print(f"Hitman Referee v{__version__}", file=sys.stderr)
 print(f"Please make sure you are using the latest version.", file=sys.stderr)
@@ -183,20 +187,305 @@ complete_map_example = {
     (6, 0): HC.EMPTY,
 }
 
+# World files
+#
+# Text format: one line per row, top row first (same layout as world_example),
+# one character per cell, blank lines are ignored:
+#     .  EMPTY        #  WALL         T  TARGET       U  SUIT
+#     P  PIANO_WIRE   N E S W  GUARD_N/E/S/W   n e s w  CIVIL_N/E/S/W
+#
+# Binary format: the magic b"HMW1", then n and m as little-endian uint32,
+# then n * m bytes holding the HC values, top row first.
+WORLD_MAGIC = b"HMW1"
+WORLD_CHARS = {
+    HC.EMPTY: ".",
+    HC.WALL: "#",
+    HC.GUARD_N: "N",
+    HC.GUARD_E: "E",
+    HC.GUARD_S: "S",
+    HC.GUARD_W: "W",
+    HC.CIVIL_N: "n",
+    HC.CIVIL_E: "e",
+    HC.CIVIL_S: "s",
+    HC.CIVIL_W: "w",
+    HC.TARGET: "T",
+    HC.SUIT: "U",
+    HC.PIANO_WIRE: "P",
+}
+
+_TEXT_TO_CODE = bytearray(256)
+for _content, _char in WORLD_CHARS.items():
+    _TEXT_TO_CODE[ord(_char)] = _content.value
+_ROW_END = b"\xff"
+_TEXT_TO_CODE[ord("\n")] = _ROW_END[0]
+_TEXT_TO_CODE = bytes(_TEXT_TO_CODE)
+
+_VALID_CODES = bytes(1 if 0 < code <= HC.PIANO_WIRE.value else 0 for code in range(256))
+
+# HC members indexed by their value, avoids calling HC(code) for every cell
+_HC_BY_CODE: Tuple = (None,) + tuple(HC)
+
+_EMPTY_CODE = HC.EMPTY.value
+_GUARD_CODES = frozenset(
+    c.value for c in (HC.GUARD_N, HC.GUARD_E, HC.GUARD_S, HC.GUARD_W)
+)
+_CIVIL_CODES = frozenset(
+    c.value for c in (HC.CIVIL_N, HC.CIVIL_E, HC.CIVIL_S, HC.CIVIL_W)
+)
+_PEOPLE_CODES = _GUARD_CODES | _CIVIL_CODES
+_PEOPLE_TABLE = bytes(1 if code in _PEOPLE_CODES else 0 for code in range(256))
+_WALKABLE_CODES = _CIVIL_CODES | frozenset(
+    c.value for c in (HC.EMPTY, HC.PIANO_WIRE, HC.SUIT, HC.TARGET)
+)
+_OFFSETS = {HC.N: (0, 1), HC.E: (1, 0), HC.S: (0, -1), HC.W: (-1, 0)}
+# direction looked at by each guard and civil
+_LOOK_OFFSETS = {
+    HC.GUARD_N.value: (0, 1),
+    HC.GUARD_E.value: (1, 0),
+    HC.GUARD_S.value: (0, -1),
+    HC.GUARD_W.value: (-1, 0),
+    HC.CIVIL_N.value: (0, 1),
+    HC.CIVIL_E.value: (1, 0),
+    HC.CIVIL_S.value: (0, -1),
+    HC.CIVIL_W.value: (-1, 0),
+}
+
+
+def parse_world(data: bytes) -> Tuple[int, int, bytes]:
+    """Decode a text or binary world file, returns (n, m, codes).
+
+    codes holds the HC values row by row, top row first.
+    """
+    if data.startswith(WORLD_MAGIC):
+        header_size = len(WORLD_MAGIC) + 8
+        if len(data) < header_size:
+            raise ValueError("Err: truncated world header")
+        n, m = struct.unpack_from("<II", data, len(WORLD_MAGIC))
+        codes = data[header_size:]
+        if n == 0 or m == 0 or len(codes) != n * m:
+            raise ValueError(f"Err: expected {n * m} cells, found {len(codes)}")
+        if 0 in codes.translate(_VALID_CODES):
+            raise ValueError("Err: invalid cell code in world")
+        return n, m, codes
+
+    rows = [
+        row
+        for row in data.translate(_TEXT_TO_CODE, b" \t\r").split(_ROW_END)
+        if row
+    ]
+    if not rows:
+        raise ValueError("Err: empty world")
+    n = len(rows[0])
+    for index, row in enumerate(rows):
+        if len(row) != n:
+            raise ValueError(f"Err: row {index} has {len(row)} cells instead of {n}")
+        if 0 in row:
+            raise ValueError(f"Err: unknown character in row {index}")
+    codes = b"".join(rows)
+    return n, len(rows), codes
+
+
+def save_world(world: List[List[HC]], filename: str, binary: bool = False) -> None:
+    """Write a world in the layout of world_example to a world file."""
+    if binary:
+        data = WORLD_MAGIC + struct.pack("<II", len(world[0]), len(world))
+        data += bytes(c.value for row in world for c in row)
+    else:
+        data = "".join(
+            "".join(WORLD_CHARS[c] for c in row) + "\n" for row in world
+        ).encode()
+    with open(filename, "wb") as f:
+        f.write(data)
+
+
+def _world_vision_indices(
+    world: bytearray, n: int, m: int, pos: Tuple[int, int], orientation: HC, dist: int = 3
+) -> List[int]:
+    offset_x, offset_y = _OFFSETS[orientation]
+    x, y = pos
+    vision = []
+    for _ in range(0, dist):
+        x, y = x + offset_x, y + offset_y
+        if x >= n or y >= m or x < 0 or y < 0:
+            break
+        vision.append(y * n + x)
+        if world[vision[-1]] != _EMPTY_CODE:
+            break
+    return vision
+
+
+def _world_vision(
+    world: bytearray, n: int, m: int, pos: Tuple[int, int], orientation: HC, dist: int = 3
+) -> List[Tuple[Tuple[int, int], HC]]:
+    return [
+        ((index % n, index // n), _HC_BY_CODE[world[index]])
+        for index in _world_vision_indices(world, n, m, pos, orientation, dist)
+    ]
+
+
+def _hearing_table(world: bytearray, n: int, m: int) -> array:
+    # per-row prefix sums of the guards and civils: table[y * (n + 1) + x] is
+    # the number of them in the cells (i, y) with i < x. A change patches one
+    # row and a query reads one entry pair per row of the square.
+    occupied = world.translate(_PEOPLE_TABLE)
+    table = array("i")
+    for y in range(m):
+        table.extend(accumulate(occupied[y * n:(y + 1) * n], initial=0))
+    return table
+
+
+def _world_listening(
+    hearing: array, n: int, m: int, pos: Tuple[int, int], dist: int = 2
+) -> int:
+    x, y = pos
+    x_min, x_max = max(x - dist, 0), min(x + dist + 1, n)
+    width = n + 1
+    count = 0
+    for row in range(max(y - dist, 0) * width, min(y + dist + 1, m) * width, width):
+        count += hearing[row + x_max] - hearing[row + x_min]
+    return min(count, 5)
+
+
+# History: one byte per run of identical actions, the opcode (index in
+# _ACTION_NAMES + 1) in the low nibble and the run length - 1 in the high one
+_ACTION_NAMES = (
+    "Move",
+    "Turn Clockwise",
+    "Turn Anti-Clockwise",
+    "Kill Target",
+    "Neutralize Guard",
+    "Neutralize Civil",
+    "Take Suit",
+    "Take Weapon",
+    "Put on Suit",
+)
+_ACTION_OPCODES = {name: opcode for opcode, name in enumerate(_ACTION_NAMES, 1)}
+
+
+def decode_history(history: bytes) -> List[str]:
+    """Expand an encoded history into the list of action names."""
+    return [
+        action
+        for code in history
+        for action in repeat(_ACTION_NAMES[(code & 0x0F) - 1], (code >> 4) + 1)
+    ]
+
+
+_PHASE_1_KEYS = (
+    "status",
+    "phase",
+    "guard_count",
+    "civil_count",
+    "m",
+    "n",
+    "position",
+    "orientation",
+    "vision",
+    "hear",
+    "penalties",
+    "is_in_guard_range",
+)
+_PHASE_2_KEYS = _PHASE_1_KEYS + (
+    "is_in_civil_range",
+    "has_suit",
+    "is_suit_on",
+    "has_weapon",
+    "is_target_down",
+)
+
+
+class HitmanStatus(Mapping):
+    """Read-only status returned by the referee, used like the former dict.
+
+    vision and hear are only computed when read. Until then the status reads
+    the referee's world buffer and hearing table, so the referee resolves them
+    (resolve()) before it next writes to those buffers.
+    """
+
+    __slots__ = tuple(k for k in _PHASE_2_KEYS if k not in ("vision", "hear")) + (
+        "_keys",
+        "_world",
+        "_hearing",
+        "_vision",
+        "_hear",
+        "__weakref__",
+    )
+
+    def __init__(
+        self, keys: Tuple[str, ...], world: bytearray, hearing: array, **values
+    ) -> None:
+        self._keys = keys
+        self._world = world
+        self._hearing = hearing
+        self._vision = None
+        self._hear = None
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    def __getitem__(self, key: str):
+        if key not in self._keys:
+            raise KeyError(key)
+        if key == "vision":
+            if self._vision is None:
+                self._vision = _world_vision(
+                    self._world, self.n, self.m, self.position, self.orientation
+                )
+            return self._vision
+        if key == "hear":
+            if self._hear is None:
+                self._hear = _world_listening(
+                    self._hearing, self.n, self.m, self.position
+                )
+            return self._hear
+        return getattr(self, key)
+
+    def resolve(self) -> None:
+        """Compute vision and hear now, then drop the references to the buffers."""
+        self["vision"]
+        self["hear"]
+        self._world = self._hearing = None
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
 class HitmanReferee:
     def __init__(self, filename: str = "") -> None:
         self.__filename = filename
         if filename == "":
-            self.__world = world_example
-            self.__m = len(self.__world)
-            self.__n = len(self.__world[0])
+            self.__n, self.__m = len(world_example[0]), len(world_example)
+            codes = bytes(c.value for row in world_example for c in row)
         else:
-            raise NotImplementedError("TODO")
+            with open(filename, "rb") as f:
+                self.__n, self.__m, codes = parse_world(f.read())
+        # flat grid of HC values, bottom row first: (x, y) is at y * n + x
+        n = self.__n
+        self.__world = bytearray().join(
+            codes[i * n:(i + 1) * n] for i in reversed(range(self.__m))
+        )
+        self.__hearing = _hearing_table(self.__world, self.__n, self.__m)
+        # set once a fork holds __world and __hearing, which must then be
+        # copied before writing
+        self.__world_shared = False
+        # statuses that may still read __world and __hearing lazily, by id
+        # (a status is a Mapping, so not hashable), resolved before the next
+        # write instead of copying the buffers
+        self.__pending_statuses = weakref.WeakValueDictionary()
 
         self.__civil_count = self.__compute_civil_count()
         self.__guard_count = self.__compute_guard_count()
         self.__civils = self.__compute_civils()
         self.__guards = self.__compute_guards()
+        self.__civil_watchers = self.__compute_watchers(self.__civils)
+        self.__guard_watchers = self.__compute_watchers(self.__guards)
+        # set when a fork holds the same visions and watcher counts
+        self.__entities_shared = False
         self.__phase = 0
         self.__phase1_penalties = 0
         self.__phase1_guess_score = 0
@@ -206,32 +495,40 @@ class HitmanReferee:
         self.__has_guessed = False
         self.__is_in_guard_range = False
         self.__is_in_civil_range = False
-        self.__phase1_history: List[str] = []
-        self.__phase2_history: List[str] = []
+        self.__phase1_history = bytearray()
+        self.__phase2_history = bytearray()
         self.__has_suit = False
         self.__suit_on = False
         self.__has_weapon = False
         self.__is_target_down = False
 
-    def start_phase1(self) -> Dict:
+    def start_phase1(self) -> HitmanStatus:
         self.__phase = 1
         return self.__get_status_phase_1()
 
-    def __get_status_phase_1(self, err: str = "OK") -> Dict:
-        return {
-            "status": err,
-            "phase": self.__phase,
-            "guard_count": self.__guard_count,
-            "civil_count": self.__civil_count,
-            "m": self.__m,
-            "n": self.__n,
-            "position": self.__pos,
-            "orientation": self.__orientation,
-            "vision": self.__get_vision(),
-            "hear": self.__get_listening(),
-            "penalties": self.__phase1_penalties,
-            "is_in_guard_range": self.__is_in_guard_range,
-        }
+    def __get_status(self, err: str = "OK") -> HitmanStatus:
+        if self.__phase == 1:
+            return self.__get_status_phase_1(err)
+        return self.__get_status_phase_2(err)
+
+    def __get_status_phase_1(self, err: str = "OK") -> HitmanStatus:
+        status = HitmanStatus(
+            _PHASE_1_KEYS,
+            self.__world,
+            self.__hearing,
+            status=err,
+            phase=self.__phase,
+            guard_count=self.__guard_count,
+            civil_count=self.__civil_count,
+            m=self.__m,
+            n=self.__n,
+            position=self.__pos,
+            orientation=self.__orientation,
+            penalties=self.__phase1_penalties,
+            is_in_guard_range=self.__is_in_guard_range,
+        )
+        self.__pending_statuses[id(status)] = status
+        return status
 
     def send_content(self, map_info: Dict[Tuple[int, int], HC]) -> bool:
         if not self.__has_guessed:
@@ -265,73 +562,88 @@ class HitmanReferee:
         return (
             True,
             f"Your score is {self.__phase1_guess_score-self.__phase1_penalties}",
-            self.__phase1_history,
+            decode_history(self.__phase1_history),
             map_content,
         )
 
     def __get_world_content(self, x: int, y: int) -> HC:
-        # provisoire
-        return self.__world[self.__m - y - 1][x]
+        return _HC_BY_CODE[self.__world[y * self.__n + x]]
 
     def __update_world_content(self, x: int, y: int, new_content: HC) -> None:
-        self.__world[self.__m - y - 1][x] = new_content
-        # comme un objet bloquant la vue peut être retiré, il faut update les visions
-        self.__civils = self.__compute_civils()
-        self.__guards = self.__compute_guards()
-
-    def __get_listening(self, dist: int = 2) -> int:
-        count = 0
-        possible_offset = range(-dist, dist + 1)
-        offsets = product(possible_offset, repeat=2)
-        x, y = self.__pos
-        for i, j in offsets:
-            pos_x, pos_y = x + i, y + j
-            if pos_x >= self.__n or pos_y >= self.__m or pos_x < 0 or pos_y < 0:
-                continue
-            if self.__get_world_content(pos_x, pos_y) in [
-                HC.CIVIL_N,
-                HC.CIVIL_E,
-                HC.CIVIL_S,
-                HC.CIVIL_W,
-                HC.GUARD_N,
-                HC.GUARD_E,
-                HC.GUARD_S,
-                HC.GUARD_W,
-            ]:
-                count += 1
-            if count == 5:
-                break
-
-        return count
+        # comme un objet bloquant la vue peut être retiré, il faut update les visions,
+        # seules celles qui passent par (x, y) peuvent changer
+        self.__unshare()
+        guards = self.__watching_entities(self.__guards, x, y, 2)
+        civils = self.__watching_entities(self.__civils, x, y, 1)
+        for pos in guards:
+            self.__add_watchers(self.__guard_watchers, self.__guards.pop(pos), -1)
+        for pos in civils:
+            self.__add_watchers(self.__civil_watchers, self.__civils.pop(pos), -1)
+
+        index = y * self.__n + x
+        people_delta = (new_content.value in _PEOPLE_CODES) - (
+            self.__world[index] in _PEOPLE_CODES
+        )
+        self.__world[index] = new_content.value
+        if people_delta:
+            self.__update_hearing(x, y, people_delta)
+
+        for pos in guards + [(x, y)]:
+            if pos not in self.__guards and self.__world[
+                pos[1] * self.__n + pos[0]
+            ] in _GUARD_CODES:
+                self.__guards[pos] = self.__get_guard_vision(*pos)
+                self.__add_watchers(self.__guard_watchers, self.__guards[pos], 1)
+        for pos in civils + [(x, y)]:
+            if pos not in self.__civils and self.__world[
+                pos[1] * self.__n + pos[0]
+            ] in _CIVIL_CODES:
+                self.__civils[pos] = self.__get_civil_vision(*pos)
+                self.__add_watchers(self.__civil_watchers, self.__civils[pos], 1)
+
+    def __update_hearing(self, x: int, y: int, delta: int) -> None:
+        # only the prefix sums of row y that include (x, y) change
+        row = y * (self.__n + 1)
+        for i in range(row + x + 1, row + self.__n + 1):
+            self.__hearing[i] += delta
+
+    def __unshare(self) -> None:
+        # statuses still reading the buffers compute their lazy fields first,
+        # only buffers held by a fork are copied
+        for status in list(self.__pending_statuses.values()):
+            status.resolve()
+        self.__pending_statuses.clear()
+        if self.__world_shared:
+            self.__world = bytearray(self.__world)
+            self.__hearing = array("i", self.__hearing)
+            self.__world_shared = False
+        if self.__entities_shared:
+            self.__guards = dict(self.__guards)
+            self.__civils = dict(self.__civils)
+            self.__guard_watchers = bytearray(self.__guard_watchers)
+            self.__civil_watchers = bytearray(self.__civil_watchers)
+            self.__entities_shared = False
+
+    def __watching_entities(
+        self, locations: Dict[Tuple[int, int], List[int]], x: int, y: int, dist: int
+    ) -> List[Tuple[int, int]]:
+        # entities standing on (x, y) or whose vision ray goes through (x, y)
+        index = y * self.__n + x
+        found = [(x, y)] if (x, y) in locations else []
+        for offset_x, offset_y in _OFFSETS.values():
+            for i in range(1, dist + 1):
+                pos = x - i * offset_x, y - i * offset_y
+                if pos in locations and index in locations[pos]:
+                    found.append(pos)
+        return found
 
     def __get_offset(self) -> Tuple[int, int]:
-        if self.__orientation == HC.N:
-            offset = 0, 1
-        elif self.__orientation == HC.E:
-            offset = 1, 0
-        elif self.__orientation == HC.S:
-            offset = 0, -1
-        elif self.__orientation == HC.W:
-            offset = -1, 0
+        return _OFFSETS[self.__orientation]
 
-        return offset
-
-    def __get_vision(self, dist: int = 3) -> List[Tuple[Tuple[int, int], HC]]:
-        offset_x, offset_y = self.__get_offset()
-        pos = self.__pos
-        x, y = pos
-        vision = []
-        for _ in range(0, dist):
-            pos = x + offset_x, y + offset_y
-            x, y = pos
-            if x >= self.__n or y >= self.__m or x < 0 or y < 0:
-                break
-            vision.append((pos, self.__get_world_content(x, y)))
-            if vision[-1][1] != HC.EMPTY:
-                break
-        return vision
+    def move(self) -> HitmanStatus:
+        return self.__get_status(self.__move())
 
-    def move(self) -> Dict:
+    def __move(self) -> str:
         offset_x, offset_y = self.__get_offset()
         x, y = self.__pos
 
@@ -347,40 +659,34 @@ class HitmanReferee:
         if (
             not (0 <= x + offset_x < self.__n)
             or not (0 <= y + offset_y < self.__m)
-            or self.__get_world_content(x + offset_x, y + offset_y)
-            not in [
-                HC.EMPTY,
-                HC.PIANO_WIRE,
-                HC.CIVIL_N,
-                HC.CIVIL_E,
-                HC.CIVIL_S,
-                HC.CIVIL_W,
-                HC.SUIT,
-                HC.TARGET,
-            ]
+            or self.__world[(y + offset_y) * self.__n + x + offset_x]
+            not in _WALKABLE_CODES
         ):
             if self.__phase == 1:
                 self.__phase1_penalties += 5 * self.__seen_by_guard_num()
-                return self.__get_status_phase_1("Err: invalid move")
+                return "Err: invalid move"
             else:
                 self.__phase2_penalties += (
                     0 if self.__suit_on else 5 * self.__seen_by_guard_num()
                 )
-                return self.__get_status_phase_2("Err: invalid move")
+                return "Err: invalid move"
 
         self.__pos = x + offset_x, y + offset_y
 
         if self.__phase == 1:
             self.__phase1_penalties += 5 * self.__seen_by_guard_num()
-            return self.__get_status_phase_1()
+            return "OK"
         else:
             self.__seen_by_civil_num()
             self.__phase2_penalties += (
                 0 if self.__suit_on else 5 * self.__seen_by_guard_num()
             )
-            return self.__get_status_phase_2()
+            return "OK"
 
-    def turn_clockwise(self) -> Dict:
+    def turn_clockwise(self) -> HitmanStatus:
+        return self.__get_status(self.__turn_clockwise())
+
+    def __turn_clockwise(self) -> str:
         if self.__phase == 1:
             self.__phase1_penalties += 1
             self.__phase1_penalties += 5 * self.__seen_by_guard_num()
@@ -403,13 +709,12 @@ class HitmanReferee:
         elif self.__orientation == HC.W:
             self.__orientation = HC.N
 
-        return (
-            self.__get_status_phase_1()
-            if self.__phase == 1
-            else self.__get_status_phase_2()
-        )
+        return "OK"
 
-    def turn_anti_clockwise(self) -> Dict:
+    def turn_anti_clockwise(self) -> HitmanStatus:
+        return self.__get_status(self.__turn_anti_clockwise())
+
+    def __turn_anti_clockwise(self) -> str:
         if self.__phase == 1:
             self.__phase1_penalties += 1
             self.__phase1_penalties += 5 * self.__seen_by_guard_num()
@@ -431,13 +736,9 @@ class HitmanReferee:
             self.__orientation = HC.E
         elif self.__orientation == HC.W:
             self.__orientation = HC.S
-        return (
-            self.__get_status_phase_1()
-            if self.__phase == 1
-            else self.__get_status_phase_2()
-        )
+        return "OK"
 
-    def start_phase2(self) -> Dict:
+    def start_phase2(self) -> HitmanStatus:
         self.__phase = 2
         self.__pos = (0, 0)
         self.__orientation = HC.N
@@ -445,34 +746,44 @@ class HitmanReferee:
         self.__seen_by_civil_num()
         return self.__get_status_phase_2()
 
-    def __get_status_phase_2(self, err: str = "OK") -> Dict:
-        return {
-            "status": err,
-            "phase": self.__phase,
-            "guard_count": self.__guard_count,
-            "civil_count": self.__civil_count,
-            "m": self.__m,
-            "n": self.__n,
-            "position": self.__pos,
-            "orientation": self.__orientation,
-            "vision": self.__get_vision(),
-            "hear": self.__get_listening(),
-            "penalties": self.__phase2_penalties,
-            "is_in_guard_range": self.__is_in_guard_range,
-            "is_in_civil_range": self.__is_in_civil_range,
-            "has_suit": self.__has_suit,
-            "is_suit_on": self.__suit_on,
-            "has_weapon": self.__has_weapon,
-            "is_target_down": self.__is_target_down,
-        }
+    def __get_status_phase_2(self, err: str = "OK") -> HitmanStatus:
+        status = HitmanStatus(
+            _PHASE_2_KEYS,
+            self.__world,
+            self.__hearing,
+            status=err,
+            phase=self.__phase,
+            guard_count=self.__guard_count,
+            civil_count=self.__civil_count,
+            m=self.__m,
+            n=self.__n,
+            position=self.__pos,
+            orientation=self.__orientation,
+            penalties=self.__phase2_penalties,
+            is_in_guard_range=self.__is_in_guard_range,
+            is_in_civil_range=self.__is_in_civil_range,
+            has_suit=self.__has_suit,
+            is_suit_on=self.__suit_on,
+            has_weapon=self.__has_weapon,
+            is_target_down=self.__is_target_down,
+        )
+        self.__pending_statuses[id(status)] = status
+        return status
 
     def end_phase2(self) -> Tuple[bool, str, List]:
         if not self.__is_target_down or not self.__pos == (0, 0):
             return False, "Err: finish the mission and go back to (0,0)", []
         self.__phase = 0
-        return True, f"Your score is {- self.__phase2_penalties}", self.__phase2_history
+        return (
+            True,
+            f"Your score is {- self.__phase2_penalties}",
+            decode_history(self.__phase2_history),
+        )
 
-    def kill_target(self) -> Dict:
+    def kill_target(self) -> HitmanStatus:
+        return self.__get_status(self.__kill_target())
+
+    def __kill_target(self) -> str:
         if self.__phase != 2:
             raise ValueError("Err: invalid phase")
 
@@ -483,7 +794,7 @@ class HitmanReferee:
         )
         x, y = self.__pos
         if self.__get_world_content(x, y) != HC.TARGET or not self.__has_weapon:
-            return self.__get_status_phase_2("Err: invalid move")
+            return "Err: invalid move"
 
         self.__update_world_content(x, y, HC.EMPTY)
         self.__is_target_down = True
@@ -491,9 +802,12 @@ class HitmanReferee:
         self.__phase2_penalties += 100 * (
             self.__seen_by_guard_num() + self.__seen_by_civil_num()
         )
-        return self.__get_status_phase_2()
+        return "OK"
 
-    def neutralize_guard(self) -> Dict:
+    def neutralize_guard(self) -> HitmanStatus:
+        return self.__get_status(self.__neutralize_guard())
+
+    def __neutralize_guard(self) -> str:
         if self.__phase != 2:
             raise ValueError("Err: invalid phase")
 
@@ -504,15 +818,13 @@ class HitmanReferee:
         offset_x, offset_y = self.__get_offset()
         x, y = self.__pos
 
-        if self.__get_world_content(x + offset_x, y + offset_y) not in [
-            HC.GUARD_N,
-            HC.GUARD_E,
-            HC.GUARD_S,
-            HC.GUARD_W,
-        ] or (x, y) in [
-            pos for (pos, _) in self.__guards[(x + offset_x, y + offset_y)]
-        ]:
-            return self.__get_status_phase_2("Err: invalid move")
+        if (
+            not self.__is_in_world(x + offset_x, y + offset_y)
+            or self.__world[(y + offset_y) * self.__n + x + offset_x]
+            not in _GUARD_CODES
+            or y * self.__n + x in self.__guards[(x + offset_x, y + offset_y)]
+        ):
+            return "Err: invalid move"
 
         self.__phase2_penalties += 20
         self.__update_world_content(x + offset_x, y + offset_y, HC.EMPTY)
@@ -521,9 +833,12 @@ class HitmanReferee:
             self.__seen_by_guard_num() + self.__seen_by_civil_num()
         )
 
-        return self.__get_status_phase_2()
+        return "OK"
+
+    def neutralize_civil(self) -> HitmanStatus:
+        return self.__get_status(self.__neutralize_civil())
 
-    def neutralize_civil(self) -> Dict:
+    def __neutralize_civil(self) -> str:
         if self.__phase != 2:
             raise ValueError("Err: invalid phase")
 
@@ -533,15 +848,13 @@ class HitmanReferee:
 
         offset_x, offset_y = self.__get_offset()
         x, y = self.__pos
-        if self.__get_world_content(x + offset_x, y + offset_y) not in [
-            HC.CIVIL_N,
-            HC.CIVIL_E,
-            HC.CIVIL_S,
-            HC.CIVIL_W,
-        ] or (x, y) in [
-            pos for (pos, _) in self.__civils[(x + offset_x, y + offset_y)]
-        ]:
-            return self.__get_status_phase_2("Err: invalid move")
+        if (
+            not self.__is_in_world(x + offset_x, y + offset_y)
+            or self.__world[(y + offset_y) * self.__n + x + offset_x]
+            not in _CIVIL_CODES
+            or y * self.__n + x in self.__civils[(x + offset_x, y + offset_y)]
+        ):
+            return "Err: invalid move"
 
         self.__phase2_penalties += 20
         self.__update_world_content(x + offset_x, y + offset_y, HC.EMPTY)
@@ -550,9 +863,12 @@ class HitmanReferee:
             self.__seen_by_guard_num() + self.__seen_by_civil_num()
         )
 
-        return self.__get_status_phase_2()
+        return "OK"
+
+    def take_suit(self) -> HitmanStatus:
+        return self.__get_status(self.__take_suit())
 
-    def take_suit(self) -> Dict:
+    def __take_suit(self) -> str:
         if self.__phase != 2:
             raise ValueError("Err: invalid phase")
 
@@ -562,14 +878,17 @@ class HitmanReferee:
 
         x, y = self.__pos
         if self.__get_world_content(x, y) != HC.SUIT:
-            return self.__get_status_phase_2("Err: invalid move")
+            return "Err: invalid move"
 
         self.__has_suit = True
         self.__update_world_content(x, y, HC.EMPTY)
 
-        return self.__get_status_phase_2()
+        return "OK"
+
+    def take_weapon(self) -> HitmanStatus:
+        return self.__get_status(self.__take_weapon())
 
-    def take_weapon(self) -> Dict:
+    def __take_weapon(self) -> str:
         if self.__phase != 2:
             raise ValueError("Err: invalid phase")
 
@@ -578,14 +897,17 @@ class HitmanReferee:
         self.__phase2_penalties += 5 * self.__seen_by_guard_num()
         x, y = self.__pos
         if self.__get_world_content(x, y) != HC.PIANO_WIRE:
-            return self.__get_status_phase_2("Err: invalid move")
+            return "Err: invalid move"
 
         self.__has_weapon = True
         self.__update_world_content(x, y, HC.EMPTY)
 
-        return self.__get_status_phase_2()
+        return "OK"
 
-    def put_on_suit(self) -> Dict:
+    def put_on_suit(self) -> HitmanStatus:
+        return self.__get_status(self.__put_on_suit())
+
+    def __put_on_suit(self) -> str:
         if self.__phase != 2:
             raise ValueError("Err: invalid phase")
 
@@ -594,13 +916,81 @@ class HitmanReferee:
         self.__phase2_penalties += 5 * self.__seen_by_guard_num()
 
         if not self.__has_suit:
-            return self.__get_status_phase_2("Err: invalid move")
+            return "Err: invalid move"
 
         self.__suit_on = True
         self.__phase2_penalties += 100 * (
             self.__seen_by_guard_num() + self.__seen_by_civil_num()
         )
-        return self.__get_status_phase_2()
+        return "OK"
+
+    def run_actions(
+        self, actions: List[str], compact: bool = False, observe: bool = True
+    ) -> Tuple[HitmanStatus, int, List[Tuple]]:
+        """Apply a sequence of actions in one call.
+
+        actions are named as in the histories ("Move", "Turn Clockwise", ...),
+        so a history returned by end_phase1 or end_phase2 can be replayed as is.
+        The sequence stops at the first action answering "Err: invalid move".
+
+        Returns the status after the last applied action, the penalties added
+        by the sequence and, if observe is set, one observation per applied
+        action: (position, orientation, vision, hear), or with compact set
+        (position, orientation, codes, hear) where codes holds the HC values
+        seen from the cell in front as bytes.
+        """
+        steps = {
+            "Move": self.__move,
+            "Turn Clockwise": self.__turn_clockwise,
+            "Turn Anti-Clockwise": self.__turn_anti_clockwise,
+            "Kill Target": self.__kill_target,
+            "Neutralize Guard": self.__neutralize_guard,
+            "Neutralize Civil": self.__neutralize_civil,
+            "Take Suit": self.__take_suit,
+            "Take Weapon": self.__take_weapon,
+            "Put on Suit": self.__put_on_suit,
+        }
+        for action in actions:
+            if action not in steps:
+                raise ValueError(f"Err: unknown action {action}")
+
+        penalties = self.__phase1_penalties + self.__phase2_penalties
+        observations = []
+        err = "OK"
+        for action in actions:
+            err = steps[action]()
+            if observe:
+                world, n, m = self.__world, self.__n, self.__m
+                if compact:
+                    vision = bytes(
+                        world[index]
+                        for index in _world_vision_indices(
+                            world, n, m, self.__pos, self.__orientation
+                        )
+                    )
+                else:
+                    vision = _world_vision(world, n, m, self.__pos, self.__orientation)
+                hear = _world_listening(self.__hearing, n, m, self.__pos)
+                observations.append((self.__pos, self.__orientation, vision, hear))
+            if err != "OK":
+                break
+        penalties = self.__phase1_penalties + self.__phase2_penalties - penalties
+        return self.__get_status(err), penalties, observations
+
+    def fork(self) -> "HitmanReferee":
+        """Independent copy of the game, for lookahead without touching this one.
+
+        The world, the visions and the watcher counts are shared until one of
+        the two referees changes the world, which then copies them.
+        """
+        clone = object.__new__(HitmanReferee)
+        clone.__dict__.update(self.__dict__)
+        clone.__pending_statuses = weakref.WeakValueDictionary()
+        self.__world_shared = clone.__world_shared = True
+        self.__entities_shared = clone.__entities_shared = True
+        clone.__phase1_history = bytearray(self.__phase1_history)
+        clone.__phase2_history = bytearray(self.__phase2_history)
+        return clone
 
     def __repr__(self) -> str:
         return f"HitmanReferee({self.__filename})"
@@ -608,182 +998,106 @@ class HitmanReferee:
     def __str__(self) -> str:
         return ASCII_ART
 
+    def __is_in_world(self, x: int, y: int) -> bool:
+        return 0 <= x < self.__n and 0 <= y < self.__m
+
     def __compute_civil_count(self) -> int:
-        count = 0
-        for l in self.__world:
-            for c in l:
-                if (
-                    c == HC.CIVIL_N
-                    or c == HC.CIVIL_E
-                    or c == HC.CIVIL_S
-                    or c == HC.CIVIL_W
-                ):
-                    count += 1
-        return count
+        return sum(self.__world.count(code) for code in _CIVIL_CODES)
 
     def __compute_guard_count(self) -> int:
-        count = 0
-        for l in self.__world:
-            for c in l:
-                if (
-                    c == HC.GUARD_N
-                    or c == HC.GUARD_E
-                    or c == HC.GUARD_S
-                    or c == HC.GUARD_W
-                ):
-                    count += 1
-        return count
+        return sum(self.__world.count(code) for code in _GUARD_CODES)
 
-    def __compute_civils(
-        self,
-    ) -> Dict[Tuple[int, int], List[Tuple[Tuple[int, int], HC]]]:
+    def __compute_locations(
+        self, codes: frozenset, get_vision
+    ) -> Dict[Tuple[int, int], List[int]]:
+        # vision of every entity whose cell holds one of codes, as flat indices
         locations = {}
-        for l_index, l in enumerate(self.__world):
-            for c_index, c in enumerate(l):
-                if (
-                    c == HC.CIVIL_N
-                    or c == HC.CIVIL_E
-                    or c == HC.CIVIL_S
-                    or c == HC.CIVIL_W
-                ):
-                    civil_x, civil_y = (c_index, self.__m - l_index - 1)
-                    locations[(civil_x, civil_y)] = self.__get_civil_vision(
-                        civil_x, civil_y
-                    )
+        for code in codes:
+            index = self.__world.find(code)
+            while index != -1:
+                pos = index % self.__n, index // self.__n
+                locations[pos] = get_vision(*pos)
+                index = self.__world.find(code, index + 1)
         return locations
 
-    def __get_civil_offset(self, civil: HC) -> Tuple[int, int]:
-        if civil == HC.CIVIL_N:
-            offset = 0, 1
-        elif civil == HC.CIVIL_E:
-            offset = 1, 0
-        elif civil == HC.CIVIL_S:
-            offset = 0, -1
-        elif civil == HC.CIVIL_W:
-            offset = -1, 0
-
-        return offset
-
-    def __get_civil_vision(
-        self, civil_x: int, civil_y: int
-    ) -> List[Tuple[Tuple[int, int], HC]]:
-        civil = self.__get_world_content(civil_x, civil_y)
-        offset_x, offset_y = self.__get_civil_offset(civil)
-        pos = (civil_x, civil_y)
-        x, y = pos
-        vision = [(pos, self.__get_world_content(x, y))]
-
-        pos = x + offset_x, y + offset_y
-        x, y = pos
+    def __compute_civils(self) -> Dict[Tuple[int, int], List[int]]:
+        return self.__compute_locations(_CIVIL_CODES, self.__get_civil_vision)
+
+    def __get_civil_vision(self, civil_x: int, civil_y: int) -> List[int]:
+        offset_x, offset_y = _LOOK_OFFSETS[self.__world[civil_y * self.__n + civil_x]]
+        vision = [civil_y * self.__n + civil_x]
+
+        x, y = civil_x + offset_x, civil_y + offset_y
         if self.__n > x >= 0 and self.__m > y >= 0:
-            vision.append((pos, self.__get_world_content(x, y)))
+            vision.append(y * self.__n + x)
         return vision
 
     def __seen_by_civil_num(self) -> int:
         count = 0
         x, y = self.__pos
-        if self.__get_world_content(x, y) in [
-            HC.CIVIL_N,
-            HC.CIVIL_E,
-            HC.CIVIL_S,
-            HC.CIVIL_W,
-        ]:
+        if self.__world[y * self.__n + x] in _CIVIL_CODES:
             count = 1
             self.__is_in_civil_range = True
             return count
 
-        for civil in self.__civils.keys():
-            civil_x, civil_y = civil
-            if civil_x == x and civil_y == y:
-                count += 1
-            else:
-                count += (
-                    1
-                    if len(
-                        [0 for ((l, c), _) in self.__civils[civil] if l == x and c == y]
-                    )
-                    > 0
-                    else 0
-                )
+        count = self.__civil_watchers[y * self.__n + x]
         self.__is_in_civil_range = count > 0
         return count
 
-    def __compute_guards(
-        self,
-    ) -> Dict[Tuple[int, int], List[Tuple[Tuple[int, int], HC]]]:
-        locations = {}
-        for l_index, l in enumerate(self.__world):
-            for c_index, c in enumerate(l):
-                if (
-                    c == HC.GUARD_N
-                    or c == HC.GUARD_E
-                    or c == HC.GUARD_S
-                    or c == HC.GUARD_W
-                ):
-                    guard_x, guard_y = (c_index, self.__m - l_index - 1)
-                    locations[(guard_x, guard_y)] = self.__get_guard_vision(
-                        guard_x, guard_y
-                    )
-        return locations
+    def __compute_guards(self) -> Dict[Tuple[int, int], List[int]]:
+        return self.__compute_locations(_GUARD_CODES, self.__get_guard_vision)
 
-    def __get_guard_offset(self, guard: HC) -> Tuple[int, int]:
-        if guard == HC.GUARD_N:
-            offset = 0, 1
-        elif guard == HC.GUARD_E:
-            offset = 1, 0
-        elif guard == HC.GUARD_S:
-            offset = 0, -1
-        elif guard == HC.GUARD_W:
-            offset = -1, 0
-
-        return offset
-
-    def __get_guard_vision(
-        self, guard_x: int, guard_y: int, dist: int = 2
-    ) -> List[Tuple[Tuple[int, int], HC]]:
-        guard = self.__get_world_content(guard_x, guard_y)
-        offset_x, offset_y = self.__get_guard_offset(guard)
-        pos = (guard_x, guard_y)
-        x, y = pos
+    def __get_guard_vision(self, guard_x: int, guard_y: int, dist: int = 2) -> List[int]:
+        offset_x, offset_y = _LOOK_OFFSETS[self.__world[guard_y * self.__n + guard_x]]
+        x, y = guard_x, guard_y
         vision = []
         for _ in range(0, dist):
-            pos = x + offset_x, y + offset_y
-            x, y = pos
+            x, y = x + offset_x, y + offset_y
             if x >= self.__n or y >= self.__m or x < 0 or y < 0:
                 break
-            vision.append((pos, self.__get_world_content(x, y)))
-            if vision[-1][1] != HC.EMPTY:
+            vision.append(y * self.__n + x)
+            if self.__world[vision[-1]] != _EMPTY_CODE:
                 break
         return vision
 
     def __seen_by_guard_num(self) -> int:
         count = 0
         x, y = self.__pos
-        if self.__get_world_content(x, y) not in [
-            HC.CIVIL_N,
-            HC.CIVIL_E,
-            HC.CIVIL_S,
-            HC.CIVIL_W,
-        ]:
-            for guard in self.__guards.keys():
-                # Note : un garde ne peut pas voir au dela d'un objet,
-                # mais si Hitman est sur l'objet alors il voit Hitman
-                count += (
-                    1
-                    if len(
-                        [0 for ((l, c), _) in self.__guards[guard] if l == x and c == y]
-                    )
-                    > 0
-                    else 0
-                )
+        if self.__world[y * self.__n + x] not in _CIVIL_CODES:
+            # Note : un garde ne peut pas voir au dela d'un objet,
+            # mais si Hitman est sur l'objet alors il voit Hitman
+            count = self.__guard_watchers[y * self.__n + x]
         self.__is_in_guard_range = count > 0
         return count
 
+    def __compute_watchers(self, locations: Dict[Tuple[int, int], List[int]]) -> bytearray:
+        # number of entities seeing each cell, indexed by y * n + x
+        watchers = bytearray(self.__n * self.__m)
+        for vision in locations.values():
+            self.__add_watchers(watchers, vision, 1)
+        return watchers
+
+    def __add_watchers(self, watchers: bytearray, vision: List[int], delta: int) -> None:
+        for index in vision:
+            watchers[index] += delta
+
+    def encoded_history(self, phase: int) -> bytes:
+        """History of a phase in its compact form, see decode_history."""
+        if phase == 1:
+            return bytes(self.__phase1_history)
+        elif phase == 2:
+            return bytes(self.__phase2_history)
+        raise ValueError("Err: invalid phase")
+
     def __add_history(self, action: str) -> None:
         if self.__phase == 1:
-            self.__phase1_history.append(action)
+            history = self.__phase1_history
         elif self.__phase == 2:
-            self.__phase2_history.append(action)
+            history = self.__phase2_history
         else:
             raise ValueError("Err: invalid phase")
-
+        opcode = _ACTION_OPCODES[action]
+        if history and history[-1] & 0x0F == opcode and history[-1] < 0xF0:
+            history[-1] += 0x10
+        else:
+            history.append(opcode)
@@ -3,56 +3,85 @@ from typing import Dict, Tuple, List
 
 from explorateur import Explorateur, MOVE_RESULT
 from hitman.hitman import HitmanReferee, HC
-from utils.PriorityQueue import PriorityQueue
+from utils.Frontiere import Frontiere
+from utils.PriorityQueue import PriorityQueue, IndexedPriorityQueue
 
 
 class Joueur:
-    def __init__(self, debug=False, with_sat=False):
+    def __init__(self, debug=False, with_sat=False, map_file: str = "", queue_type: type = PriorityQueue,
+                 mode_saut: bool = False, mode_bidirectionnel: bool = False, mode_replanification: bool = False,
+                 mode_gain: bool = False):
         self.phase_1_res = None
         self.debug = debug
         self.with_sat = with_sat
-        self.referre = HitmanReferee()
+        self.queue_type = queue_type
+        self.mode_saut = mode_saut
+        # recherche bidirectionnelle pour les longs trajets de la phase 2, où toute la carte est connue
+        self.mode_bidirectionnel = mode_bidirectionnel
+        # replanification incrémentale pendant les déplacements de la phase 1, la seule où la carte change
+        self.mode_replanification = mode_replanification
+        # phase 1 guidée par les points de vue (case, orientation) plutôt que par les cases à découvrir
+        self.mode_gain = mode_gain
+        self.referre = HitmanReferee(map_file)
 
     def play_phase_1(self):
         start_time = datetime.now()
 
         init_status = self.referre.start_phase1()
-        explo_queue = PriorityQueue()
-
-        total_x = init_status["n"]
-        total_y = init_status["m"]
+        # file indexée : les coûts des cases restant à découvrir sont mis à jour en place à chaque itération
+        explo_queue = IndexedPriorityQueue()
 
         init_position = init_status["position"]
         init_orientation = init_status["orientation"]
 
-        explorateur = Explorateur(referre=self.referre, init_status=init_status, phase=1, debug=self.debug, with_dimacs=self.with_sat)
+        explorateur = Explorateur(referre=self.referre, init_status=init_status, phase=1, debug=self.debug, with_dimacs=self.with_sat,
+                                  queue_type=self.queue_type,
+                                  mode_replanification=self.mode_replanification, mode_gain=self.mode_gain)
         explorateur.print_status(init_status)
 
-        for i in range(total_x):
-            for j in range(total_y):
-                if (i, j) not in explorateur.cases_connues and i < total_x and j < total_y:
-                    explorateur.cases_connues[(i, j)] = -1
-                    explo_queue.push((i, j))
+        # seules les cases inconnues voisines d'une case connue praticable sont candidates : pour atteindre
+        # les autres, il faut de toute façon passer par l'une d'elles
+        frontiere = Frontiere(explorateur.cases_connues)
+        for pos in frontiere:
+            explo_queue.push(pos)
 
         MAP_DISCOVERED = False
         next_to_explore = (0, 0)
+        if self.mode_gain:
+            self.explorer_points_de_vue(explorateur)
+            MAP_DISCOVERED = True
 
         while not MAP_DISCOVERED:
+            if explorateur.deduction.carte_deduite():
+                print("CARTE DEDUITE : plus aucune personne ni objet possible dans les cases inconnues")
+                break
+            ajoutees, _ = frontiere.mettre_a_jour()
+            for pos in ajoutees:
+                explo_queue.push(pos)
+            if next_to_explore in frontiere:
+                # la cible précédente n'a pas été découverte, on la réévalue avec les autres
+                explo_queue.push(next_to_explore)
             if explo_queue.isEmpty():
                 break
-
-            nouvelle_explo_queue = PriorityQueue()
-            explo_path: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
-
-            while not explo_queue.isEmpty():
-                pos = explo_queue.pop()
-                if explorateur.cases_connues[pos] == -1:
-                    result, path, path_cost = self.get_best_path(explorateur, pos, explorateur.position, explorateur.orientation, False)
-                    nouvelle_explo_queue.push(pos, path_cost)
-                    explo_path[pos] = path
-            explo_queue = nouvelle_explo_queue
-
-            while explorateur.position == next_to_explore or explorateur.cases_connues[next_to_explore] != -1:
+            if self.debug:
+                print(f"FRONTIERE : {len(frontiere)} cases en {len(frontiere.groupes())} groupes")
+
+            # un seul Dijkstra depuis la position courante donne le coût de toutes les cases de la frontière
+            explo_couts, explo_parents, explo_arrivees = explorateur.search_dijkstra_multi(
+                cibles=[pos for pos in explo_queue if pos in frontiere],
+                current_pos=explorateur.position, current_orientation=explorateur.orientation)
+            for pos in explo_queue:
+                if pos not in frontiere:
+                    explo_queue.remove(pos)
+                    continue
+                if pos not in explo_couts:
+                    # case enfermée, on ne pourra jamais la voir
+                    explo_queue.remove(pos)
+                    continue
+                explo_queue.update(pos, explo_couts[pos])
+
+            while explorateur.position == next_to_explore or explorateur.cases_connues[next_to_explore] != -1 or \
+                    next_to_explore not in explo_couts:
                 if explo_queue.isEmpty():
                     MAP_DISCOVERED = True
                     break
@@ -62,7 +91,8 @@ class Joueur:
                 break
 
             print(f"--------------      EXPLORATION-{next_to_explore}      ---------------------")
-            explorateur.move_to_goal(goal=next_to_explore, path=explo_path[next_to_explore])
+            explo_path = explorateur.reconstruire_chemin_oriente(explo_parents, explo_arrivees[next_to_explore])
+            explorateur.move_to_goal(goal=next_to_explore, path=explo_path)
             explorateur.print_map()
             print("-------------------------------------------------------------------")
         explorateur.print_map()
@@ -71,6 +101,7 @@ class Joueur:
             pos = explo_queue.pop()
             print(f"NEXT-POS-TO-EXPLORE : {pos}")
         print(f"TOTAL PENALTIES : {explorateur.penalties}")
+        print(f"NOEUDS DEVELOPPES : {explorateur.noeuds_developpes}")
         print(f"TOTAL MOUVEMENT : {explorateur.moves}")
         print(f"EXPLORED_NODE : {explorateur.explored_node}")
         print(f"EXPLORED_NODE_LENGTH : {len(explorateur.explored_node)}")
@@ -82,9 +113,25 @@ class Joueur:
         self.phase_1_res = self.referre.end_phase1()
         del explorateur
 
+    def explorer_points_de_vue(self, explorateur: Explorateur):
+        # Chaque itération va au point de vue (case, orientation) le moins cher qui révèle des cases inconnues,
+        # jusqu'à ce qu'aucun point de vue atteignable n'en montre ou que la déduction n'ait plus rien à chercher
+        while not explorateur.deduction.carte_deduite():
+            gains = explorateur.cases_connues.gains_vision()
+            point_de_vue, parents = explorateur.search_point_de_vue(gains)
+            if point_de_vue is None:
+                break
+            print(f"--------------      POINT DE VUE-{point_de_vue}      ---------------------")
+            chemin = explorateur.reconstruire_chemin_oriente(parents, point_de_vue)
+            explorateur.aller_au_point_de_vue(chemin, point_de_vue[1])
+            explorateur.print_map()
+            print("-------------------------------------------------------------------")
+
     def play_phase_2(self):
         status = self.referre.start_phase2()
-        explorateur = Explorateur(referre=self.referre, init_status=status, phase=2, debug=True, with_dimacs=False)
+        explorateur = Explorateur(referre=self.referre, init_status=status, phase=2, debug=True, with_dimacs=False,
+                                  queue_type=self.queue_type, mode_saut=self.mode_saut,
+                                  mode_bidirectionnel=self.mode_bidirectionnel)
 
         map_infos = self.phase_1_res[3]
 
@@ -147,6 +194,8 @@ class Joueur:
 
         status = self.referre.end_phase2()
         print(f"STRATEGY CHOSEN : {strategy_cost} - {strategy_obj}")
+        print(f"CACHE CHEMINS : {explorateur.cache_chemins.stats()}")
+        print(f"NOEUDS DEVELOPPES : {explorateur.noeuds_developpes}")
         explorateur.print_map()
         print(status)
         print(self.phase_1_res)
@@ -190,36 +239,13 @@ class Joueur:
     def get_best_path(self, explorateur: Explorateur, goal: Tuple[int, int], init_position: Tuple[int, int],
                       init_orientation: HC, suit_on: bool) -> Tuple[
         MOVE_RESULT, List[Tuple[int, int]], int]:
-        temp_path = explorateur.search_a_star_sauvgarde_etat(goal=goal,
-                                                             successor=explorateur.get_safe_succ,
-                                                             current_pos=init_position,
-                                                             current_orientation=init_orientation)
-        temp_path_2 = explorateur.search_a_star_sauvgarde_etat(goal=goal,
-                                                               successor=explorateur.get_succ,
-                                                               current_pos=init_position,
-                                                               current_orientation=init_orientation)
-        if temp_path[0] is None and temp_path_2[0] is None:
+        chemin, path_cost = explorateur.search_a_star_oriente(goal=goal,
+                                                              current_pos=init_position,
+                                                              current_orientation=init_orientation,
+                                                              suit_on=suit_on)
+        if len(chemin) == 0:
             return MOVE_RESULT.UNREACHABLE_GOAL, [], 0
-        temp_chemin = explorateur.reconstruire_chemin(temp_path[1], init_position, goal) if temp_path[
-                                                                                                0] is not None else []
-        temp_chemin_2 = explorateur.reconstruire_chemin(temp_path_2[1], init_position, goal) if temp_path_2[
-                                                                                                    0] is not None else []
-
-        path_1_cost, _ = explorateur.valuate_path(temp_chemin,
-                                                  init_pos=init_position,
-                                                  init_orientation=init_orientation,
-                                                  suit_on=suit_on
-                                                  )
-        path_2_cost, _ = explorateur.valuate_path(temp_chemin_2,
-                                                  init_pos=init_position,
-                                                  init_orientation=init_orientation,
-                                                  suit_on=suit_on
-                                                  )
-
-        if len(temp_chemin) == 0 or path_1_cost > path_2_cost:
-            temp_chemin = temp_chemin_2
-            path_1_cost = path_2_cost
-        return MOVE_RESULT.GOAL_REACHED, temp_chemin, path_1_cost
+        return MOVE_RESULT.GOAL_REACHED, chemin, path_cost
 
     def send_map_to_referee(self, explorateur: Explorateur):
         map_info = explorateur.get_map_infos_for_referee()
@@ -1,6 +1,7 @@
 import sys
 
 from joueur import Joueur
+from utils.PriorityQueue import PriorityQueue, BucketPriorityQueue
 
 
 def print_help():
@@ -11,6 +12,12 @@ def print_help():
     print("Args:")
     print("\t--h : affiche ce help")
     print("\t--debug : Active le mode debug, par défaut le mode est désactivé")
+    print("\t--map=<fichier> : Charge la carte depuis un fichier, par défaut la carte d'exemple est utilisée")
+    print("\t--bucket : Utilise une file de priorité à seaux dans les recherches, par défaut un tas est utilisé")
+    print("\t--saut : Saute les lignes droites sans pénalité dans les trajets de la phase 2 (jump point search)")
+    print("\t--bidir : Recherche bidirectionnelle pour les trajets de la phase 2")
+    print("\t--gain : Explore la phase 1 par points de vue (case, orientation) au lieu de viser des cases inconnues")
+    print("\t--dstar : Replanifie les trajets de la phase 1 à chaque pas avec D* Lite au lieu de suivre un chemin figé")
 
 
 def main(args):
@@ -19,7 +26,11 @@ def main(args):
     else:
         sat_found = False
         sat = False
+        map_file = ""
         for arg in args:
+            if arg.startswith("--map="):
+                map_file = arg[len("--map="):]
+                continue
             if arg.lower().strip() in ["sat", "no-sat"]:
                 if sat_found:
                     print("Vous ne pouvez pas spécifier deux fois si vous voulez utiliser le solver SAT ou non")
@@ -28,7 +39,7 @@ def main(args):
                 if arg.lower().strip() == "sat":
                     sat = True
                 sat_found = True
-            if arg.lower().strip() not in ["no-sat", "sat", "--debug", "--h"]:
+            if arg.lower().strip() not in ["no-sat", "sat", "--debug", "--h", "--bucket", "--saut", "--bidir", "--dstar", "--gain"]:
                 print("Argument inconnu : " + arg)
                 print_help()
                 return
@@ -41,10 +52,23 @@ def main(args):
         debug = False
         if "--debug" in args:
             debug = True
+        queue_type = BucketPriorityQueue if "--bucket" in args else PriorityQueue
+        mode_saut = "--saut" in args
+        mode_bidirectionnel = "--bidir" in args
+        mode_replanification = "--dstar" in args
+        mode_gain = "--gain" in args
     print(f"Récapitulatif des choix : ")
     print("\t Utilisation du solver SAT : " + str(sat))
     print("\t Mode debug : " + str(debug))
-    joueur = Joueur(debug=debug, with_sat=sat)
+    print("\t Carte : " + (map_file if map_file else "carte d'exemple"))
+    print("\t File de priorité : " + queue_type.__name__)
+    print("\t Mode saut : " + str(mode_saut))
+    print("\t Recherche bidirectionnelle en phase 2 : " + str(mode_bidirectionnel))
+    print("\t Replanification D* Lite en phase 1 : " + str(mode_replanification))
+    print("\t Exploration par points de vue en phase 1 : " + str(mode_gain))
+    joueur = Joueur(debug=debug, with_sat=sat, map_file=map_file, queue_type=queue_type, mode_saut=mode_saut,
+                    mode_bidirectionnel=mode_bidirectionnel, mode_replanification=mode_replanification,
+                    mode_gain=mode_gain)
     joueur.play_phase_1()
     joueur.print_res(joueur.phase_1_res)
     joueur.play_phase_2()
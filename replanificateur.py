@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional, Tuple
+
+from hitman.hitman import HC
+from utils.GrilleConnaissance import OFFSETS_ORIENTATION as OFFSETS, ROTATION_HORAIRE, ROTATION_ANTI_HORAIRE
+from utils.PriorityQueue import IndexedPriorityQueue
+
+INFINI = float("inf")
+Etat = Tuple[Tuple[int, int], HC]
+
+
+class DStarLite:
+    """Replanification incrémentale (D* Lite) vers un but, sur les états (case, orientation) de l'Explorateur.
+
+    La recherche part du but et remonte vers Hitman : g et rhs sont des coûts jusqu'au but, avec les coûts
+    exacts de Explorateur.search_a_star_oriente. Quand des cases changent dans cases_connues (lues dans son
+    journal), seuls les états dont un arc touche ces cases sont recalculés, puis la recherche reprend là où
+    elle s'était arrêtée au lieu de repartir de zéro.
+    """
+
+    def __init__(self, explorateur, goal: Tuple[int, int], depart: Etat, suit_on: bool = False):
+        self.explorateur = explorateur
+        self.goal = goal
+        self.suit_on = suit_on
+        self.depart = depart
+        self.dernier_depart = depart
+        self.km = 0
+        self.g: Dict[Etat, float] = {}
+        self.rhs: Dict[Etat, float] = {}
+        self.file = IndexedPriorityQueue()
+        self.lu_journal = len(explorateur.cases_connues.journal)
+        self.noeuds_developpes = 0
+        for orientation in OFFSETS:
+            self.rhs[(goal, orientation)] = 0
+            self.file.push((goal, orientation), self.__cle((goal, orientation)))
+
+    def __heuristique(self, etat: Etat) -> int:
+        return abs(etat[0][0] - self.depart[0][0]) + abs(etat[0][1] - self.depart[0][1])
+
+    def __cle(self, etat: Etat) -> Tuple[float, float]:
+        valeur = min(self.g.get(etat, INFINI), self.rhs.get(etat, INFINI))
+        return valeur + self.__heuristique(etat) + self.km, valeur
+
+    def successeurs(self, etat: Etat) -> List[Tuple[Etat, int]]:
+        pos, orientation = etat
+        explorateur = self.explorateur
+        cout_tour = 1 + explorateur.cout_surveillance(pos, self.suit_on)
+        succ = [((pos, ROTATION_HORAIRE[orientation]), cout_tour),
+                ((pos, ROTATION_ANTI_HORAIRE[orientation]), cout_tour)]
+        offset_x, offset_y = OFFSETS[orientation]
+        devant = pos[0] + offset_x, pos[1] + offset_y
+        if explorateur.is_case_safe(devant):
+            succ.append(((devant, orientation), 1 + explorateur.cout_surveillance(devant, self.suit_on)))
+        return succ
+
+    def __predecesseurs(self, etat: Etat) -> List[Etat]:
+        pos, orientation = etat
+        pred = [(pos, ROTATION_HORAIRE[orientation]), (pos, ROTATION_ANTI_HORAIRE[orientation])]
+        offset_x, offset_y = OFFSETS[orientation]
+        derriere = pos[0] - offset_x, pos[1] - offset_y
+        if self.explorateur.is_case_safe(pos) and self.explorateur.is_case_safe(derriere):
+            pred.append((derriere, orientation))
+        return pred
+
+    def __maj_etat(self, etat: Etat):
+        if etat[0] != self.goal:
+            if self.explorateur.is_case_safe(etat[0]):
+                self.rhs[etat] = min(cout + self.g.get(suivant, INFINI) for suivant, cout in self.successeurs(etat))
+            else:
+                # Hitman ne peut pas se trouver sur un mur ou un garde
+                self.rhs[etat] = INFINI
+        if self.file.contains(etat):
+            self.file.remove(etat)
+        if self.g.get(etat, INFINI) != self.rhs.get(etat, INFINI):
+            self.file.push(etat, self.__cle(etat))
+
+    def calculer(self):
+        while not self.file.isEmpty() and (
+                self.file.priority(self.file.peek()) < self.__cle(self.depart) or
+                self.rhs.get(self.depart, INFINI) != self.g.get(self.depart, INFINI)):
+            etat = self.file.peek()
+            ancienne_cle = self.file.priority(etat)
+            nouvelle_cle = self.__cle(etat)
+            self.noeuds_developpes += 1
+            if ancienne_cle < nouvelle_cle:
+                self.file.update(etat, nouvelle_cle)
+            elif self.g.get(etat, INFINI) > self.rhs.get(etat, INFINI):
+                self.g[etat] = self.rhs[etat]
+                self.file.remove(etat)
+                for pred in self.__predecesseurs(etat):
+                    self.__maj_etat(pred)
+            else:
+                self.g[etat] = INFINI
+                for pred in self.__predecesseurs(etat) + [etat]:
+                    self.__maj_etat(pred)
+
+    def deplacer_depart(self, depart: Etat):
+        # Hitman a bougé : les clés déjà dans la file restent valables à km près
+        self.depart = depart
+        self.km += abs(self.dernier_depart[0][0] - depart[0][0]) + abs(self.dernier_depart[0][1] - depart[0][1])
+        self.dernier_depart = depart
+
+    def prendre_en_compte_changements(self):
+        # Recalcule les états dont un arc part de, ou entre dans, une case modifiée depuis le dernier appel
+        journal = self.explorateur.cases_connues.journal
+        cases = set(journal[self.lu_journal:])
+        self.lu_journal = len(journal)
+        etats = set()
+        for case in cases:
+            for orientation, (offset_x, offset_y) in OFFSETS.items():
+                etats.add((case, orientation))
+                etats.add(((case[0] - offset_x, case[1] - offset_y), orientation))
+        for etat in etats:
+            if etat[0] in self.explorateur.cases_connues:
+                self.__maj_etat(etat)
+
+    def cout(self) -> float:
+        return self.g.get(self.depart, INFINI)
+
+    def prochain_etat(self) -> Optional[Etat]:
+        meilleur, meilleur_cout = None, INFINI
+        for suivant, cout in self.successeurs(self.depart):
+            if cout + self.g.get(suivant, INFINI) < meilleur_cout:
+                meilleur, meilleur_cout = suivant, cout + self.g.get(suivant, INFINI)
+        return meilleur
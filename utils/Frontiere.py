@@ -0,0 +1,87 @@
+from typing import Iterator, List, Set, Tuple
+
+import numpy as np
+
+from utils.GrilleConnaissance import GrilleConnaissance, INCONNU
+
+VOISINS: Tuple[Tuple[int, int], ...] = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+class Frontiere:
+    """Cases inconnues collées à une case connue praticable, les seules par lesquelles Hitman peut entrer
+    en territoire inconnu.
+
+    Calculée une fois sur toute la grille, puis tenue à jour avec le journal de GrilleConnaissance : seules
+    les cases modifiées depuis le dernier appel à mettre_a_jour et leurs voisines sont réexaminées.
+    """
+
+    def __init__(self, grille: GrilleConnaissance):
+        self.grille = grille
+        self.lu_journal = len(grille.journal)
+        connues_praticables = grille.masque_praticable() & ~grille.masque_inconnu()
+        voisine = np.zeros_like(connues_praticables)
+        voisine[1:, :] |= connues_praticables[:-1, :]
+        voisine[:-1, :] |= connues_praticables[1:, :]
+        voisine[:, 1:] |= connues_praticables[:, :-1]
+        voisine[:, :-1] |= connues_praticables[:, 1:]
+        self.cases: Set[Tuple[int, int]] = set(grille.positions(grille.masque_inconnu() & voisine))
+
+    def __contains__(self, pos) -> bool:
+        return pos in self.cases
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self.cases)
+
+    def __len__(self) -> int:
+        return len(self.cases)
+
+    def est_frontiere(self, pos: Tuple[int, int]) -> bool:
+        grille = self.grille
+        if grille[pos] != INCONNU:
+            return False
+        for offset_x, offset_y in VOISINS:
+            voisin = pos[0] + offset_x, pos[1] + offset_y
+            if voisin in grille and grille[voisin] != INCONNU and grille.est_praticable(voisin):
+                return True
+        return False
+
+    def mettre_a_jour(self) -> Tuple[Set[Tuple[int, int]], Set[Tuple[int, int]]]:
+        """Relit le journal de la grille et renvoie les cases entrées dans la frontière et celles qui en sont sorties."""
+        journal = self.grille.journal
+        a_verifier = set()
+        for case in journal[self.lu_journal:]:
+            a_verifier.add(case)
+            for offset_x, offset_y in VOISINS:
+                a_verifier.add((case[0] + offset_x, case[1] + offset_y))
+        self.lu_journal = len(journal)
+
+        ajoutees, retirees = set(), set()
+        for case in a_verifier:
+            if case not in self.grille:
+                continue
+            if self.est_frontiere(case):
+                if case not in self.cases:
+                    self.cases.add(case)
+                    ajoutees.add(case)
+            elif case in self.cases:
+                self.cases.remove(case)
+                retirees.add(case)
+        return ajoutees, retirees
+
+    def groupes(self) -> List[List[Tuple[int, int]]]:
+        """Regroupe les cases de la frontière en morceaux connexes (voisinage à 4)."""
+        restantes = set(self.cases)
+        groupes = []
+        while restantes:
+            pile = [restantes.pop()]
+            groupe = []
+            while pile:
+                case = pile.pop()
+                groupe.append(case)
+                for offset_x, offset_y in VOISINS:
+                    voisin = case[0] + offset_x, case[1] + offset_y
+                    if voisin in restantes:
+                        restantes.remove(voisin)
+                        pile.append(voisin)
+            groupes.append(groupe)
+        return groupes
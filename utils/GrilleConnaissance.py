@@ -0,0 +1,206 @@
+from collections.abc import MutableMapping
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from hitman.hitman import HC
+
+INCONNU = -1
+
+# Direction du regard de chaque garde, il voit à 2 cases sauf si une case non vide le bloque
+REGARD_GARDES: Dict[int, Tuple[int, int]] = {HC.GUARD_N.value: (0, 1), HC.GUARD_E.value: (1, 0),
+                                             HC.GUARD_S.value: (0, -1), HC.GUARD_W.value: (-1, 0)}
+# Déplacement d'un pas et orientation obtenue après un quart de tour horaire / anti-horaire
+OFFSETS_ORIENTATION: Dict[HC, Tuple[int, int]] = {HC.N: (0, 1), HC.E: (1, 0), HC.S: (0, -1), HC.W: (-1, 0)}
+ROTATION_HORAIRE: Dict[HC, HC] = {HC.N: HC.E, HC.E: HC.S, HC.S: HC.W, HC.W: HC.N}
+ROTATION_ANTI_HORAIRE: Dict[HC, HC] = {HC.N: HC.W, HC.W: HC.S, HC.S: HC.E, HC.E: HC.N}
+
+
+def _table(valeurs) -> np.ndarray:
+    # table de correspondance indexée par valeur + 1, pour que INCONNU tombe sur l'indice 0
+    table = np.zeros(len(HC) + 2, dtype=bool)
+    for valeur in valeurs:
+        table[valeur + 1] = True
+    return table
+
+
+_GARDES = _table(REGARD_GARDES)
+_INCONNUS = _table([INCONNU])
+_CIVILS = _table([HC.CIVIL_N.value, HC.CIVIL_E.value, HC.CIVIL_S.value, HC.CIVIL_W.value])
+# une case inconnue ne bloque pas : on suppose le pire pour la surveillance
+_BLOQUANTES = ~_table([INCONNU, HC.EMPTY.value])
+# même règle que Explorateur.is_case_safe : ni mur ni garde, les cases inconnues sont tentées
+_PRATICABLES = ~(_GARDES | _table([HC.WALL.value]))
+
+
+# ordre des directions dans les tables de longueurs de rayons
+DIRECTIONS: Tuple[Tuple[int, int], ...] = tuple(REGARD_GARDES.values())
+INDICE_DIRECTION: Dict[Tuple[int, int], int] = {direction: i for i, direction in enumerate(DIRECTIONS)}
+
+
+@lru_cache(maxsize=2)
+def longueurs_rayons(total_x: int, total_y: int, portee: int) -> np.ndarray:
+    """longueurs[d, x, y] est le nombre de cases vues depuis (x, y) dans la direction DIRECTIONS[d] jusqu'à
+    portee, coupé au bord de la carte. Les cases du rayon s'en déduisent, seules les longueurs sont gardées
+    (un octet par case et par direction), et seulement pour la dernière taille de carte."""
+    xs = np.broadcast_to(np.arange(total_x)[:, None], (total_x, total_y))
+    ys = np.broadcast_to(np.arange(total_y)[None, :], (total_x, total_y))
+    restes = {(1, 0): total_x - 1 - xs, (-1, 0): xs, (0, 1): total_y - 1 - ys, (0, -1): ys}
+    longueurs = np.empty((len(DIRECTIONS), total_x, total_y), dtype=np.int8)
+    for i, direction in enumerate(DIRECTIONS):
+        longueurs[i] = np.minimum(restes[direction], portee)
+    return longueurs
+
+
+class GrilleConnaissance(MutableMapping):
+    """Connaissances d'Hitman sur la carte, une valeur HC (ou INCONNU) par case dans un tableau numpy.
+
+    S'utilise comme l'ancien Dict[Tuple[int, int], int] : toutes les cases de la carte sont présentes
+    et valent INCONNU par défaut, une position hors carte lève KeyError. La couche de surveillance
+    (nombre de gardes connus qui voient chaque case) est tenue à jour localement à chaque écriture.
+    """
+
+    def __init__(self, total_x: int, total_y: int):
+        self.total_x = total_x
+        self.total_y = total_y
+        self.valeurs = np.full((total_x, total_y), INCONNU, dtype=np.int8)
+        self.surveillance = np.zeros((total_x, total_y), dtype=np.int16)
+        self.vision_gardes: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        # incrémentée à chaque case qui change de valeur, sert à invalider ce qui a été calculé avant
+        self.version = 0
+        # cases dont la valeur ou le nombre de gardes qui les voient a changé, dans l'ordre, pour les
+        # calculs incrémentaux qui retiennent jusqu'où ils ont lu
+        self.journal: List[Tuple[int, int]] = []
+        # longueur des rayons vus par un garde (2 cases) et par Hitman (3 cases) depuis chaque case
+        self.longueurs_gardes = longueurs_rayons(total_x, total_y, 2)
+        self.longueurs_hitman = longueurs_rayons(total_x, total_y, 3)
+
+    def __contains__(self, pos) -> bool:
+        return 0 <= pos[0] < self.total_x and 0 <= pos[1] < self.total_y
+
+    def __getitem__(self, pos: Tuple[int, int]) -> int:
+        if not (0 <= pos[0] < self.total_x and 0 <= pos[1] < self.total_y):
+            raise KeyError(pos)
+        return self.valeurs.item(pos)
+
+    def __setitem__(self, pos: Tuple[int, int], valeur: int):
+        ancienne = self[pos]
+        if ancienne == valeur:
+            return
+        self.valeurs[pos] = valeur
+        self.version += 1
+        self.journal.append(pos)
+        gardes = []
+        if ancienne in REGARD_GARDES or valeur in REGARD_GARDES:
+            gardes.append(pos)
+        if _BLOQUANTES[ancienne + 1] != _BLOQUANTES[valeur + 1]:
+            # seuls les gardes collés à la case ont un regard qui la traverse
+            for offset_x, offset_y in REGARD_GARDES.values():
+                voisin = pos[0] + offset_x, pos[1] + offset_y
+                if voisin in self.vision_gardes:
+                    gardes.append(voisin)
+        for garde in gardes:
+            self.__maj_vision_garde(garde)
+
+    def __delitem__(self, pos: Tuple[int, int]):
+        self[pos] = INCONNU
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for x in range(self.total_x):
+            for y in range(self.total_y):
+                yield x, y
+
+    def __len__(self) -> int:
+        return self.total_x * self.total_y
+
+    def __maj_vision_garde(self, garde: Tuple[int, int]):
+        for case in self.vision_gardes.pop(garde, []):
+            self.surveillance[case] -= 1
+            self.journal.append(case)
+        valeur = self.valeurs.item(garde)
+        if valeur not in REGARD_GARDES:
+            return
+        vision = []
+        for case in self.rayon_gardes(garde, REGARD_GARDES[valeur]):
+            vision.append(case)
+            if _BLOQUANTES[self.valeurs.item(case) + 1]:
+                break
+        for case in vision:
+            self.surveillance[case] += 1
+            self.journal.append(case)
+        self.vision_gardes[garde] = vision
+
+    @staticmethod
+    def __rayon(pos: Tuple[int, int], direction: Tuple[int, int], longueurs: np.ndarray) -> List[Tuple[int, int]]:
+        offset_x, offset_y = direction
+        longueur = longueurs.item(INDICE_DIRECTION[direction], pos[0], pos[1])
+        return [(pos[0] + offset_x * i, pos[1] + offset_y * i) for i in range(1, longueur + 1)]
+
+    def rayon_gardes(self, pos: Tuple[int, int], direction: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Cases vues par un garde en pos qui regarde dans direction, sans tenir compte des obstacles."""
+        return self.__rayon(pos, direction, self.longueurs_gardes)
+
+    def rayon_hitman(self, pos: Tuple[int, int], direction: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Cases vues par Hitman en pos qui regarde dans direction, sans tenir compte des obstacles."""
+        return self.__rayon(pos, direction, self.longueurs_hitman)
+
+    def nb_gardes_voyant(self, pos: Tuple[int, int]) -> int:
+        if not (0 <= pos[0] < self.total_x and 0 <= pos[1] < self.total_y):
+            return 0
+        return self.surveillance.item(pos)
+
+    def est_praticable(self, pos: Tuple[int, int]) -> bool:
+        return pos in self and bool(_PRATICABLES[self.valeurs.item(pos) + 1])
+
+    def bloque_vue(self, pos: Tuple[int, int]) -> bool:
+        return pos in self and bool(_BLOQUANTES[self.valeurs.item(pos) + 1])
+
+    # Masques sur toute la carte, indexés [x, y] comme valeurs
+    def masque_inconnu(self) -> np.ndarray:
+        return _INCONNUS[self.valeurs + 1]
+
+    def masque_praticable(self) -> np.ndarray:
+        return _PRATICABLES[self.valeurs + 1]
+
+    def masque_gardes(self) -> np.ndarray:
+        return _GARDES[self.valeurs + 1]
+
+    def masque_civils(self) -> np.ndarray:
+        return _CIVILS[self.valeurs + 1]
+
+    def masque_bloquant(self) -> np.ndarray:
+        return _BLOQUANTES[self.valeurs + 1]
+
+    def masque_surveille(self) -> np.ndarray:
+        return self.surveillance > 0
+
+    def gains_vision(self, portee: int = 3) -> Dict[Tuple[int, int], np.ndarray]:
+        """gains[direction][x, y] est le nombre de cases inconnues que Hitman verrait depuis (x, y) en regardant
+        dans cette direction, avec la même règle que le référé : la vue s'arrête après la première case non vide.
+        Les cases inconnues ne bloquent pas, comme pour la surveillance."""
+        inconnues = self.masque_inconnu()
+        bloquantes = self.masque_bloquant()
+        gains = {}
+        for offset_x, offset_y in REGARD_GARDES.values():
+            gain = np.zeros((self.total_x, self.total_y), dtype=np.int8)
+            visible = np.ones((self.total_x, self.total_y), dtype=bool)
+            for i in range(1, portee + 1):
+                dx, dy = offset_x * i, offset_y * i
+                # cible[x, y] = masque[x + dx, y + dy], False hors de la carte
+                long_x, long_y = max(0, self.total_x - abs(dx)), max(0, self.total_y - abs(dy))
+                source = (slice(max(0, dx), max(0, dx) + long_x), slice(max(0, dy), max(0, dy) + long_y))
+                cible = (slice(max(0, -dx), max(0, -dx) + long_x), slice(max(0, -dy), max(0, -dy) + long_y))
+                inconnue_i = np.zeros_like(visible)
+                inconnue_i[cible] = inconnues[source]
+                bloquante_i = np.zeros_like(visible)
+                bloquante_i[cible] = bloquantes[source]
+                gain += visible & inconnue_i
+                visible &= ~bloquante_i
+            gains[(offset_x, offset_y)] = gain
+        return gains
+
+    def positions(self, masque: Optional[np.ndarray] = None) -> List[Tuple[int, int]]:
+        if masque is None:
+            return list(self)
+        return [(int(x), int(y)) for x, y in np.argwhere(masque)]
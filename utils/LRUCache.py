@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Cache borné : au-delà de Capacity entrées, la moins récemment utilisée est supprimée."""
+
+    def __init__(self, capacity=4096):
+        if capacity <= 0:
+            raise ValueError(f"LRUCache : capacité strictement positive attendue, reçu {capacity}")
+        self.Capacity = capacity
+        self.Entries = OrderedDict()
+        self.Hits = 0
+        self.Misses = 0
+        self.Evictions = 0
+
+    def get(self, key, default=None):
+        if key in self.Entries:
+            self.Entries.move_to_end(key)
+            self.Hits += 1
+            return self.Entries[key]
+        self.Misses += 1
+        return default
+
+    def put(self, key, value):
+        self.Entries[key] = value
+        self.Entries.move_to_end(key)
+        if len(self.Entries) > self.Capacity:
+            self.Entries.popitem(last=False)
+            self.Evictions += 1
+
+    def clear(self):
+        self.Entries.clear()
+
+    def hit_rate(self):
+        total = self.Hits + self.Misses
+        return self.Hits / total if total else 0.0
+
+    def stats(self):
+        return {"hits": self.Hits, "misses": self.Misses, "evictions": self.Evictions,
+                "size": len(self.Entries), "hit_rate": round(self.hit_rate(), 3)}
+
+    def __contains__(self, key):
+        return key in self.Entries
+
+    def __len__(self):
+        return len(self.Entries)
@@ -1,4 +1,5 @@
 import heapq
+from collections import deque
 
 
 class PriorityQueue:
@@ -17,3 +18,154 @@ class PriorityQueue:
 
     def isEmpty(self):
         return len(self.Heap) == 0
+
+
+class BucketPriorityQueue:
+    """File de priorité à seaux (algorithme de Dial) pour des priorités entières positives ou nulles.
+
+    Un seau FIFO par priorité : push en O(1), pop en O(1) amorti tant que les priorités sorties ne
+    décroissent pas (cas de Dijkstra et d'A* avec une heuristique consistante). À priorité égale
+    l'ordre d'insertion est conservé, comme pour PriorityQueue.
+    """
+
+    def __init__(self):
+        self.Buckets = []
+        self.Current = 0
+        self.Size = 0
+
+    def push(self, item, priority=0):
+        if priority < 0 or priority != int(priority):
+            raise ValueError(f"BucketPriorityQueue : priorité entière positive attendue, reçu {priority}")
+        priority = int(priority)
+        if priority >= len(self.Buckets):
+            self.Buckets.extend(deque() for _ in range(priority + 1 - len(self.Buckets)))
+        self.Buckets[priority].append(item)
+        if priority < self.Current:
+            self.Current = priority
+        self.Size += 1
+
+    def pop(self):
+        if self.Size == 0:
+            raise IndexError("pop from empty BucketPriorityQueue")
+        while not self.Buckets[self.Current]:
+            self.Current += 1
+        self.Size -= 1
+        return self.Buckets[self.Current].popleft()
+
+    def isEmpty(self):
+        return self.Size == 0
+
+
+class IndexedPriorityQueue:
+    """Tas binaire indexé : chaque élément n'y est qu'une fois et sa priorité peut être modifiée en place.
+
+    push d'un élément déjà présent met à jour sa priorité au lieu d'ajouter un doublon, la taille du tas
+    reste donc bornée par le nombre d'éléments distincts. Toute modification de priorité compte comme une
+    nouvelle insertion pour départager les égalités, l'ordre de sortie est le même qu'avec PriorityQueue
+    où l'on repousserait l'élément en ignorant ensuite l'ancienne entrée.
+    """
+
+    def __init__(self):
+        self.Heap = []
+        self.Index = {}
+        self.Count = 0
+
+    def push(self, item, priority=0):
+        if item in self.Index:
+            self.update(item, priority)
+            return
+        self.Index[item] = len(self.Heap)
+        self.Heap.append([priority, self.Count, item])
+        self.Count += 1
+        self.__sift_up(len(self.Heap) - 1)
+
+    def pop(self):
+        if not self.Heap:
+            raise IndexError("pop from empty IndexedPriorityQueue")
+        item = self.Heap[0][2]
+        self.__remove_at(0)
+        return item
+
+    def isEmpty(self):
+        return len(self.Heap) == 0
+
+    def peek(self):
+        if not self.Heap:
+            raise IndexError("peek from empty IndexedPriorityQueue")
+        return self.Heap[0][2]
+
+    def contains(self, item) -> bool:
+        return item in self.Index
+
+    def priority(self, item):
+        return self.Heap[self.Index[item]][0]
+
+    def update(self, item, priority):
+        i = self.Index[item]
+        entry = self.Heap[i]
+        old_priority = entry[0]
+        entry[0] = priority
+        entry[1] = self.Count
+        self.Count += 1
+        if priority < old_priority:
+            self.__sift_up(i)
+        else:
+            self.__sift_down(i)
+
+    def decrease_key(self, item, priority):
+        if priority > self.priority(item):
+            raise ValueError(f"decrease_key : {priority} est supérieure à la priorité actuelle de {item}")
+        self.update(item, priority)
+
+    def remove(self, item):
+        self.__remove_at(self.Index[item])
+
+    def __len__(self):
+        return len(self.Heap)
+
+    def __iter__(self):
+        # éléments dans l'ordre où pop les renverrait, sans modifier le tas
+        return iter([entry[2] for entry in sorted(self.Heap, key=lambda entry: (entry[0], entry[1]))])
+
+    def __remove_at(self, i):
+        del self.Index[self.Heap[i][2]]
+        last = self.Heap.pop()
+        if i < len(self.Heap):
+            self.Heap[i] = last
+            self.Index[last[2]] = i
+            self.__sift_up(i)
+            self.__sift_down(self.Index[last[2]])
+
+    def __less(self, a, b):
+        return (a[0], a[1]) < (b[0], b[1])
+
+    def __sift_up(self, i):
+        heap = self.Heap
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not self.__less(entry, heap[parent]):
+                break
+            heap[i] = heap[parent]
+            self.Index[heap[i][2]] = i
+            i = parent
+        heap[i] = entry
+        self.Index[entry[2]] = i
+
+    def __sift_down(self, i):
+        heap = self.Heap
+        size = len(heap)
+        entry = heap[i]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and self.__less(heap[child + 1], heap[child]):
+                child += 1
+            if not self.__less(heap[child], entry):
+                break
+            heap[i] = heap[child]
+            self.Index[heap[i][2]] = i
+            i = child
+        heap[i] = entry
+        self.Index[entry[2]] = i